@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reusable buffers for the receive chain.
+
+A receiver that processes continuous audio calls the same functions on blocks
+of the same size over and over. Instead of allocating new arrays for every
+block, the scratch arrays are taken from a BufferPool, and the signal history
+of the stream decoders is kept in a RingBuffer of fixed capacity.
+"""
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    A set of named scratch arrays. get() returns the array of the given name,
+    which is only (re)allocated if the requested size does not fit or the
+    type differs. Hence, calling a function with the same pool and arrays of
+    the same (or smaller) sizes does not allocate new scratch arrays.
+
+    N.B.: The contents of a buffer are overwritten by the next user of the
+    same name, and a pool must not be shared between threads.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name: str, shape, dtype=float):
+        """
+        Returns an (uninitialized) array of the given shape and type.
+        """
+        shape = tuple(np.atleast_1d(shape))
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buf = self._buffers.get(name)
+        if buf is None or buf.dtype != dtype or buf.shape[0] < size:
+            buf = np.empty((size,), dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:size].reshape(shape)
+
+    @property
+    def nbytes(self):
+        """
+        Total size of the buffers in bytes.
+        """
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+class RingBuffer:
+    """
+    Holds the most recent samples of a stream. New samples are appended at the
+    end and old samples are discarded from the beginning. The samples are kept
+    contiguous in memory (such that they can be filtered and indexed like an
+    array): When the end of the storage is reached, the retained samples are
+    moved to its beginning. The storage only grows (by doubling) if the
+    retained samples do not fit.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial capacity in samples.
+    dtype : data-type, default: float
+        Type of the samples.
+    """
+
+    def __init__(self, capacity: int, dtype=float):
+        self._data = np.empty((max(int(capacity), 1),), dtype=dtype)
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def data(self):
+        """
+        View of the retained samples (valid until the next append()).
+        """
+        return self._data[self._start:self._stop]
+
+    def append(self, x):
+        """
+        Appends the samples `x`.
+        """
+        N = x.shape[0]
+        if self._stop + N > self._data.shape[0]:
+            n = len(self)
+            if n + N > self._data.shape[0]:
+                data = np.empty((max(2*self._data.shape[0], n + N),), dtype=self._data.dtype)
+                data[:n] = self.data
+                self._data = data
+            else:
+                # Move the samples in chunks that do not overlap, which
+                # avoids a temporary copy
+                s = self._start
+                for i in range(0, n, s):
+                    j = min(i+s, n)
+                    self._data[i:j] = self._data[s+i:s+j]
+            self._start = 0
+            self._stop = n
+        self._data[self._stop:self._stop+N] = x
+        self._stop += N
+
+    def discard(self, n: int):
+        """
+        Discards the `n` oldest samples.
+        """
+        self._start += min(max(n, 0), len(self))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A small dataflow executor for running independent stages of the receiver
+chain concurrently.
+
+The heavy stages of the receiver (filtering, averaging) are NumPy and SciPy
+kernels that release the global interpreter lock, hence independent stages
+can run in parallel on a thread pool without copying data between processes.
+The results are the same as when the stages are run one after another.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import os
+import numpy as np
+from scipy import signal
+
+
+def run_graph(stages, inputs=None, executor=None, max_workers: int=None):
+    """
+    Runs a directed acyclic graph of stages on a thread pool. A stage is run
+    as soon as all the stages it depends on are done, so independent branches
+    of the graph run concurrently.
+
+    For example, averaging the power and the complex signal are independent
+    given the demodulated signal:
+
+        stages = {
+            'yb': (demodulate, ['y']),
+            'xm2': (average_power, ['yb']),
+            'xx': (average, ['yb']),
+            'b': (decide, ['xm2', 'xx'])
+        }
+        results = run_graph(stages, {'y': y})
+
+    Parameters
+    ----------
+    stages : dict
+        Maps the name of each stage to a tuple `(func, deps)`, where `deps`
+        is a list of names of stages or inputs. The stage is evaluated as
+        func(*[results[dep] for dep in deps]).
+    inputs : dict, optional
+        Values that are available from the start.
+    executor : concurrent.futures.Executor, optional
+        The executor to run the stages on. If None, a thread pool with
+        `max_workers` threads is created for the call.
+    max_workers : int, optional
+        Number of threads of the thread pool (default: number of CPUs).
+
+    Returns
+    -------
+    results : dict
+        The inputs and the results of all stages.
+    """
+    results = dict(inputs or {})
+    pending = dict(stages)
+    for name, (func, deps) in pending.items():
+        for dep in deps:
+            if dep not in pending and dep not in results:
+                raise ValueError(f"Stage '{name}' depends on '{dep}', which is neither a stage nor an input.")
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return run_graph(stages, inputs, executor)
+
+    running = {}
+    while pending or running:
+        # Start all stages whose dependencies are done
+        ready = [name for name, (func, deps) in pending.items() if all(dep in results for dep in deps)]
+        for name in ready:
+            func, deps = pending.pop(name)
+            running[executor.submit(func, *[results[dep] for dep in deps])] = name
+        if not running:
+            raise ValueError(f"The stages {', '.join(pending)} have cyclic dependencies.")
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+
+    return results
+
+def lfilter(b, a, x, axis: int=-1, executor=None, chunk: int=None, nchunks: int=None):
+    """
+    Same as scipy.signal.lfilter(b, a, x, axis=axis), but runs on the
+    executor in parallel chunks. See submit_lfilter() to start several filters
+    before waiting for the results.
+
+    Signals with leading batch dimensions are split into chunks of rows. A
+    one-dimensional signal is split into chunks of (at least) `chunk` samples
+    along time if the filter is an FIR filter (`a` is a scalar): each chunk
+    is extended by the last len(b)-1 samples of the previous chunk, which
+    makes the result exact. IIR filters depend on all past samples and are not
+    split along time.
+
+    Parameters
+    ----------
+    b, a : numpy.array
+        Filter coefficients.
+    x : numpy.array
+        Signal.
+    axis : int, default: -1
+        Axis along which to filter.
+    executor : concurrent.futures.Executor, optional
+        The executor to run the chunks on. If None, the signal is filtered
+        in one call.
+    chunk : int, optional
+        Minimum chunk length along time (default: the signal is split into
+        `nchunks` chunks, but of at least 8*len(b) samples).
+    nchunks : int, optional
+        Number of chunks (default: number of CPUs).
+
+    Returns
+    -------
+    y : numpy.array
+        The filtered signal.
+    """
+    return submit_lfilter(b, a, x, axis, executor, chunk, nchunks)()
+
+def submit_lfilter(b, a, x, axis: int=-1, executor=None, chunk: int=None, nchunks: int=None):
+    """
+    Starts filtering like lfilter() and returns a function that waits for and
+    returns the result. Filtering runs in the background only if `executor`
+    is given.
+
+    N.B.: Waiting for the result in a task that itself runs on `executor` can
+    deadlock when all threads of the executor are waiting.
+    """
+    b = np.atleast_1d(b)
+    a = np.atleast_1d(a)
+    x = np.moveaxis(np.asarray(x), axis, -1)
+    nchunks = nchunks or os.cpu_count() or 1
+
+    if executor is None:
+        y = signal.lfilter(b, a, x, axis=-1)
+        collect = lambda: y
+
+    elif x.ndim > 1 and np.prod(x.shape[:-1]) > 1:
+        # Split the batch into chunks of rows
+        xr = x.reshape((-1, x.shape[-1]))
+        rows = np.array_split(np.arange(xr.shape[0]), min(nchunks, xr.shape[0]))
+        futures = [executor.submit(signal.lfilter, b, a, xr[r[0]:r[-1]+1], -1) for r in rows]
+        collect = lambda: np.concatenate([f.result() for f in futures], axis=0).reshape(x.shape)
+
+    elif a.shape[0] == 1:
+        # Split an FIR filter along time with overlapping chunks
+        M = b.shape[0] - 1
+        N = x.shape[-1]
+        chunk = max(chunk or -(-N//nchunks), 8*(M+1))
+        starts = range(0, N, chunk)
+        futures = [executor.submit(signal.lfilter, b, a, x[..., max(k-M, 0):k+chunk], -1) for k in starts]
+        collect = lambda: np.concatenate([f.result()[..., min(k, M):] for k, f in zip(starts, futures)], axis=-1)
+
+    else:
+        future = executor.submit(signal.lfilter, b, a, x, -1)
+        collect = future.result
+
+    return lambda: np.moveaxis(collect(), -1, axis)
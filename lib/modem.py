@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filter design, modulator, and demodulator shared by the transmitter, the
+receiver, and the simulation of the wireless communication system.
+
+All signals may have leading batch dimensions, the functions operate along the
+last axis.
+"""
+
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+from .dataflow import lfilter
+
+
+# f_pass and f_stop are input as tuples in Hz
+# A_pass and A_stop are input in DB
+# The designs are cached, the coefficients must not be modified
+@lru_cache(maxsize=64)
+def filter_bp(f_pass, f_stop, A_pass, A_stop, f_sample):
+    fn = f_sample / 2
+
+    w_pass = [f / fn for f in f_pass]
+    w_stop = [f / fn for f in f_stop]
+
+    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
+
+
+@lru_cache(maxsize=64)
+def filter_lp(f_pass, f_stop, A_pass, A_stop, f_sample):
+    fn = f_sample / 2
+
+    w_pass = f_pass / fn
+    w_stop = f_stop / fn
+
+    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
+
+
+# f_carrier in Hz
+# x_bt input signal
+# out (optional) receives the modulated signal, must not overlap with x_bt
+def modulator(A_carrier, f_carrier, x_bt, f_sampling, out=None):
+    if out is None:
+        out = np.empty(np.shape(x_bt))
+
+    # Carrier based on the sampling frequency and signal length, computed in
+    # the output (in its first row for several signals)
+    rows = out.reshape((-1, out.shape[-1]))
+    c = _time(rows[0])
+    c *= 2 * np.pi * f_carrier / f_sampling
+    np.sin(c, out=c)
+    c *= A_carrier
+    for row in rows[1:]:
+        row[...] = c
+
+    # Generate the modulated signal using vectorized operations
+    out *= x_bt
+
+    return out
+
+
+# The filter runs on the executor, if given (see dataflow.lfilter())
+# out (optional, complex) receives the demodulated signal, must not overlap
+# with y. The signal is then mixed and filtered in place, in chunks of Nchunk
+# samples without an executor (which bounds the temporaries of the filter).
+def demodulator(f_carrier, y, f_stop, A_pass, A_stop, f_sample, executor=None, out=None, Nchunk=2**16):
+    if out is None:
+        out = np.empty(np.shape(y), dtype=complex)
+
+    rows = out.reshape((-1, out.shape[-1]))
+    c = _time(rows[0])
+    c *= -2j * np.pi * f_carrier / f_sample
+    np.exp(c, out=c)
+    for row in rows[1:]:
+        row[...] = c
+
+    # Mix the received signal with in-phase and quadrature carriers at once:
+    # y*exp(-jwt) = y*cos(wt) - j*y*sin(wt)
+    out *= y
+
+    lp_filter_b, lp_filter_a = filter_lp(f_carrier, f_stop, A_pass, A_stop, f_sample)
+
+    # The filter is real, hence filtering the complex signal filters the I and
+    # Q branches separately
+    if executor is not None:
+        out[...] = lfilter(lp_filter_b, lp_filter_a, out, executor=executor)
+    else:
+        z = np.zeros(out.shape[:-1] + (max(len(lp_filter_a), len(lp_filter_b)) - 1,), dtype=complex)
+        for k in range(0, out.shape[-1], Nchunk):
+            out[..., k:k+Nchunk], z = signal.lfilter(lp_filter_b, lp_filter_a, out[..., k:k+Nchunk], zi=z)
+
+    return out
+
+
+# Writes the sample indices 0, 1, ... to the (one-dimensional) array t
+# without allocating them
+def _time(t):
+    t.fill(1)
+    t[:1] = 0
+    return np.cumsum(t, out=t)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive selection of the symbol length from the link quality reported by the
+decoder.
+
+All entry points use a fixed pulse width (Tb = 0.12, i.e., two sidelobes
+within the channel), which is what the worst link needs. The signal-to-noise
+ratio of the averaged symbols grows linearly with the symbol length, so a
+good link can run several times faster with the same bit error rate.
+"""
+
+import numpy as np
+from scipy.special import erfc
+
+
+def ber(snr):
+    """
+    Bit error rate of binary phase-shift keying at the symbol signal-to-noise
+    ratio `snr` (in dB) as reported by wcs.decode_baseband_signal(), that is,
+    Q(sqrt(2*SNR)).
+    """
+    return 0.5*erfc(np.sqrt(10**(np.asarray(snr)/10)))
+
+
+class RateController:
+    """
+    Chooses the symbol length of the next frame on each channel.
+
+    For each channel, the controller keeps an (exponentially averaged) estimate
+    of the signal-to-noise ratio for each symbol length it has received frames
+    with. The signal-to-noise ratio at the other symbol lengths is predicted 
+    by scaling the closest estimate with the symbol length, which however 
+    ignores the inter-symbol interference of the band-limiting filters at 
+    short symbols. Hence, the controller only speeds up one step at a time,
+    after which the estimate at the new symbol length takes over. The next
+    symbol length is the shortest one whose (predicted) bit error rate, less 
+    a safety margin, meets the target. After a failed frame, the controller
+    falls back to the longest symbol length. If a measurement is more than
+    the margin below its prediction, the link has changed and the estimates
+    of the other symbol lengths are discarded (and predicted from the new
+    measurement).
+
+    Parameters
+    ----------
+    Tbs : tuple of float, default: (0.04, 0.06, 0.08, 0.12)
+        Available symbol lengths in seconds.
+    target_ber : float, default: 1e-4
+        Target bit error rate.
+    margin : float, default: 3.0
+        Safety margin on the signal-to-noise ratio in dB.
+    alpha : float, default: 0.5
+        Weight of a new measurement in the average.
+    """
+
+    def __init__(self, Tbs=(0.04, 0.06, 0.08, 0.12), target_ber: float=1e-4, margin: float=3.0, alpha: float=0.5):
+        self.Tbs = np.sort(np.asarray(Tbs, dtype=float))
+        self.target_ber = target_ber
+        self.margin = margin
+        self.alpha = alpha
+
+        # Per channel: index of the current symbol length and the averaged 
+        # signal-to-noise ratios (NaN if not measured)
+        self._index = {}
+        self._snr = {}
+
+    def Tb(self, channel_id: int):
+        """
+        Returns the symbol length to use for the next frame on the channel.
+        """
+        return self.Tbs[self._index.get(channel_id, self.Tbs.shape[0]-1)]
+
+    def update(self, channel_id: int, Tb: float, info=None):
+        """
+        Updates the controller with the result of a frame.
+
+        Parameters
+        ----------
+        channel_id : int
+            The id of the channel.
+        Tb : float
+            Symbol length of the frame in seconds.
+        info : dict, optional
+            The frame information returned by wcs.decode_baseband_signal(..., 
+            full_output=True) or the `'end'` event of 
+            wcs.decode_baseband_stream(). None (or a NaN signal-to-noise 
+            ratio) if the frame was lost.
+
+        Returns
+        -------
+        Tb : float
+            Symbol length to use for the next frame.
+        """
+        snr = self._snr.setdefault(channel_id, np.full(self.Tbs.shape, np.nan))
+        i = int(np.argmin(np.abs(self.Tbs - Tb)))
+        if info is None or not np.isfinite(info['snr']):
+            self._index[channel_id] = self.Tbs.shape[0]-1
+            snr[:i+1] = np.nan
+            return self.Tb(channel_id)
+
+        if np.any(np.isfinite(snr)) and info['snr'] < self._predict(snr)[i] - self.margin:
+            snr[:] = np.nan
+        snr[i] = info['snr'] if np.isnan(snr[i]) else (1-self.alpha)*snr[i] + self.alpha*info['snr']
+        pred = self._predict(snr)
+
+        # Shortest symbol length meeting the target, at most one step faster
+        ok = ber(pred - self.margin) <= self.target_ber
+        ok[:max(i-1, 0)] = False
+        self._index[channel_id] = int(np.argmax(ok)) if np.any(ok) else self.Tbs.shape[0]-1
+        return self.Tb(channel_id)
+
+    def _predict(self, snr):
+        # Predict the signal-to-noise ratio of the symbol lengths that have 
+        # not been measured from the closest one that has
+        measured = np.flatnonzero(np.isfinite(snr))
+        j = measured[np.argmin(np.abs(measured[None, :] - np.arange(self.Tbs.shape[0])[:, None]), axis=-1)]
+        return np.where(np.isfinite(snr), snr, snr[j] + 10*np.log10(self.Tbs/self.Tbs[j]))
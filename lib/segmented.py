@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Segmented decoding of long recordings on a process pool.
+
+A long recording (for example, hours of monitoring) is split into overlapping
+windows that are decoded in parallel by separate processes. The recording is
+placed in shared memory once, and each process decodes a view of its window
+instead of receiving a pickled copy. Since the overlap is longer than the
+longest frame, every frame is seen in full by at least one window, and the
+duplicates found by two windows are merged.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from . import wcslib as wcs
+
+
+def decode_segmented(xb, Tb: float, fs: float, Tmax: float, Twin: float=None, noise_power: float=None, noise_dof: float=None, threshold: float=None, max_workers: int=None, Bn: float=0.15, Bt: float=0.01, min_llr: float=None, Nconf: int=8, min_bits: int=8):
+    """
+    Decodes all frames in a long, complex IQ-demodulated baseband signal `xb`
+    by decoding overlapping windows on a process pool.
+
+    Each window is decoded with wcs.decode_baseband_stream(), which finds any
+    number of frames. Since the noise floor cannot be calibrated at the start
+    of each window, it is estimated once for the whole recording as the median
+    power of the signal divided by ln(2), the median of an exponentially
+    distributed power (this assumes that the channel is idle at least half of
+    the time), unless given by `noise_power`. The degrees of freedom of the
+    noise power summed over a symbol (which set the detection threshold, see
+    wcs.decode_baseband_stream()) do not depend on the noise level and are
+    estimated from the second of the recording with the lowest power, unless
+    given by `noise_dof`.
+
+    The windows overlap by Tmax plus a guard of two symbols on each side. A
+    frame is only kept from a window if it was detected after the guard at the
+    start (otherwise, it may have started before the window) and ended within
+    the window. Given that no frame is longer than `Tmax`, every frame is then
+    kept from at least one window. Frames from different windows whose
+    synchronization points are less than a symbol apart are duplicates, and
+    only the first one is kept. Frames that are aborted by the decoder (see 
+    `min_llr`) and frames with fewer than `min_bits` bits (for example, a 
+    noise burst that was synchronized to) are dropped.
+
+    Parameters
+    ----------
+    xb : numpy.array
+        The complex IQ-demodulated baseband signal.
+    Tb : float
+        Pulse width in seconds.
+    fs : float
+        Sampling frequency in Hz.
+    Tmax : float
+        Maximum duration of a frame in seconds.
+    Twin : float, optional
+        Window length in seconds (default: 4*Tmax, at least 60 s). The
+        temporaries of the decoder scale with the window length instead of
+        the recording.
+    noise_power : float, optional
+        Power of the noise in the baseband signal.
+    noise_dof : float, optional
+        Degrees of freedom of the noise power summed over a symbol.
+    threshold : float, optional
+        Detection threshold in dB above the noise floor. If None, the 
+        threshold is derived from the statistics of the noise.
+    max_workers : int, optional
+        Number of processes (default: number of CPUs).
+    Bn, Bt : float
+        Loop bandwidths, see wcs.decode_baseband_signal().
+    min_llr : float, optional
+        Minimum confidence below which a frame is aborted, see 
+        wcs.decode_baseband_stream(). If None, frames are never aborted.
+    Nconf : int, default: 8
+        Number of bits over which the confidence is averaged.
+    min_bits : int, default: 8
+        Minimum number of bits of a frame.
+
+    Returns
+    -------
+    frames : list of tuple
+        `(k0, bits, info)` for each frame in order, where `k0` is the (absolute)
+        end of the synchronization sequence, `bits` the decoded bits, and
+        `info` the frame information (see wcs.decode_baseband_signal()).
+    """
+    xb = np.ascontiguousarray(xb, dtype=complex)
+    N = xb.shape[0]
+    Kb = int(np.floor(Tb*fs))
+    guard = 2*Kb
+    overlap = int(np.ceil(Tmax*fs)) + 2*guard
+    W = max(int(np.round((Twin or max(4*Tmax, 60.0))*fs)), 2*overlap)
+    starts = list(range(0, max(N - overlap, 1), W - overlap))
+
+    if noise_power is None:
+        x = xb[::max(N//1000000, 1)]
+        noise_power = np.median(x.real**2 + x.imag**2)/np.log(2)
+    if noise_dof is None and threshold is None:
+        Ks = int(np.round(fs))
+        P = np.add.reduceat(xb.real**2 + xb.imag**2, np.arange(0, max(N - Ks + 1, 1), Ks))
+        k = Ks*int(np.argmin(P))
+        _, noise_dof = wcs._noise_stats(xb[k:k+Ks], Kb)
+
+    shm = SharedMemory(create=True, size=xb.nbytes)
+    try:
+        np.ndarray(xb.shape, dtype=xb.dtype, buffer=shm.buf)[:] = xb
+        args = (shm.name, N, Tb, fs, noise_power, noise_dof, threshold, Bn, Bt, min_llr, Nconf, min_bits, guard)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_decode_window, *args, k, min(k + W, N)) for k in starts]
+            frames = [frame for f in futures for frame in f.result()]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Merge the duplicates from the overlaps
+    merged = []
+    for frame in sorted(frames, key=lambda frame: frame[0]):
+        if len(merged) == 0 or frame[0] - merged[-1][0] >= Kb:
+            merged.append(frame)
+
+    return merged
+
+def _decode_window(name: str, N: int, Tb: float, fs: float, noise_power: float, noise_dof: float, threshold: float, Bn: float, Bt: float, min_llr: float, Nconf: int, min_bits: int, guard: int, start: int, stop: int):
+    """
+    Decodes the frames in the window [start, stop) of the shared signal, see
+    decode_segmented().
+    """
+    shm = _attach(name)
+    try:
+        x = np.ndarray((N,), dtype=complex, buffer=shm.buf)[start:stop]
+        events = wcs.decode_baseband_stream([x], Tb, fs, threshold=threshold, noise_power=noise_power, noise_dof=noise_dof, Bn=Bn, Bt=Bt, min_llr=min_llr, Nconf=Nconf)
+
+        frames = []
+        m = None
+        k0 = None
+        bits = []
+        for kind, k, value, latency in events:
+            if kind == 'detect':
+                m = k
+                k0 = None
+            elif kind == 'sync':
+                k0 = k
+                bits = []
+            elif kind == 'bit':
+                bits.append(value)
+            elif kind == 'end':
+                if (start == 0 or m >= guard) and len(bits) >= min_bits:
+                    info = dict(value, k0=start + k0)
+                    frames.append((start + int(k0), np.array(bits, dtype=bool), info))
+                k0 = None
+            elif kind == 'abort':
+                k0 = None
+        del x
+    finally:
+        shm.close()
+
+    # A frame that is still being decoded at the end of the recording is
+    # kept as well (without frame information)
+    if stop == N and k0 is not None and (start == 0 or m >= guard) and len(bits) >= min_bits:
+        frames.append((start + int(k0), np.array(bits, dtype=bool), None))
+
+    return frames
+
+def _attach(name: str):
+    """
+    Attaches to an existing shared memory block. The block is unlinked by the
+    process that created it, whose resource tracker the workers share.
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        return SharedMemory(name=name)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spectral planning of the channels: Spectra of the modulated pulses and the
+responses of the band-limiting filters, evaluated over whole frequency grids
+(and several pulse widths) at once.
+
+The filters are designed with the same function and specifications as in the
+transmitter and the receiver (see modem.filter_bp() and channel_filter()), so
+the plans do not drift from what is actually transmitted.
+"""
+
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+from .modem import filter_bp
+from .wcslib import _channels, _check_channel
+
+
+def pulse_spectrum(f, Tb, f_carrier: float, A_carrier: float=1.0):
+    """
+    Fourier transform Xm(f) of a rect pulse of width `Tb` (starting at t = 0)
+    modulated onto the carrier A_carrier*sin(2*pi*f_carrier*t), that is,
+
+        Xm(f) = A_carrier*j/2*(Xb(f + f_carrier) - Xb(f - f_carrier)),
+
+    where Xb(f) = Tb*sinc(f*Tb)*exp(-j*pi*f*Tb).
+
+    Parameters
+    ----------
+    f : numpy.array
+        Frequencies in Hz.
+    Tb : float or numpy.array
+        Pulse width(s) in seconds. The result broadcasts over `Tb` and `f`, for
+        example, Tb[:, None] and f yield one spectrum per row.
+    f_carrier : float
+        Carrier frequency in Hz.
+    A_carrier : float, default: 1.0
+        Amplitude of the carrier.
+
+    Returns
+    -------
+    Xm : numpy.array
+        The (complex) spectrum.
+    """
+    f = np.asarray(f)
+    Tb = np.asarray(Tb)
+    Xb = lambda f: Tb*np.sinc(f*Tb)*np.exp(-1j*np.pi*f*Tb)
+    return A_carrier*1j/2*(Xb(f + f_carrier) - Xb(f - f_carrier))
+
+def pulse_psd(f, Tb, f_carrier: float):
+    """
+    One-sided power spectral density of a carrier modulated by random,
+    equiprobable bits of width `Tb`, normalized to unit power, that is,
+
+        S(f) = Tb*sinc((f - f_carrier)*Tb)^2
+
+    (neglecting the image at -f_carrier). Broadcasts like pulse_spectrum().
+    """
+    f = np.asarray(f)
+    Tb = np.asarray(Tb)
+    return Tb*np.sinc((f - f_carrier)*Tb)**2
+
+def channel_filter(channel_id: int, fs: float=35e3, f_transition: float=25.0, A_pass: float=1.0, A_stop: float=60.0):
+    """
+    Designs the band-limiting filter of a channel as in the transmitter, with
+    the pass band equal to the channel and stop band edges `f_transition` Hz
+    outside of it.
+
+    Returns
+    -------
+    b, a : numpy.array
+        Filter coefficients, see modem.filter_bp().
+    """
+    fl, fu = _channel(channel_id)[:2]
+    return filter_bp((fl, fu), (fl - f_transition, fu + f_transition), A_pass, A_stop, fs)
+
+@lru_cache(maxsize=128)
+def filter_response(channel_id: int, fmin: float, fmax: float, n: int, fs: float=35e3, f_transition: float=25.0, A_pass: float=1.0, A_stop: float=60.0):
+    """
+    Frequency response of the band-limiting filter of a channel (see
+    channel_filter()) on the grid np.linspace(fmin, fmax, n). The responses
+    are cached, the returned arrays are read-only.
+
+    Returns
+    -------
+    f : numpy.array
+        Frequencies in Hz.
+    H : numpy.array
+        Complex frequency response.
+    """
+    b, a = channel_filter(channel_id, fs, f_transition, A_pass, A_stop)
+    f = np.linspace(fmin, fmax, n)
+    _, H = signal.freqz(b, a, worN=f, fs=fs)
+    f.flags.writeable = False
+    H.flags.writeable = False
+    return f, H
+
+def plan_channel(channel_id: int, Tb, fs: float=35e3, f_transition: float=25.0, A_pass: float=1.0, A_stop: float=60.0, in_band: float=0.95, n: int=4001):
+    """
+    Evaluates the spectral footprint of transmitting with pulse width(s) `Tb`
+    on a channel from _channels.
+
+    The in-band fraction is the fraction of the (unfiltered) signal power
+    within the channel. Keeping the main lobe and one sidelobe within the
+    channel, which is what Tb = 0.08 does on a 50 Hz channel, corresponds to
+    about 95 %, two sidelobes (Tb = 0.12) to about 96.5 %. The minimum pulse
+    width is the shortest one for which the in-band fraction is at least
+    `in_band`, found over a grid of pulse widths in one evaluation.
+
+    After the band-limiting filter, the occupied bandwidth is the bandwidth
+    that contains 99 % of the signal power, and the leakage is the power
+    outside the channel relative to the total power (in dB). The filter loss
+    is the fraction of the power that is removed by the filter (in dB), which
+    shows up as inter-symbol interference at the receiver.
+
+    Parameters
+    ----------
+    channel_id : int
+        The id of the channel.
+    Tb : float or numpy.array
+        Pulse width(s) in seconds.
+    fs : float, default: 35e3
+        Sampling frequency in Hz.
+    f_transition, A_pass, A_stop : float
+        Specifications of the band-limiting filter, see channel_filter().
+    in_band : float, default: 0.95
+        Required in-band fraction for the minimum pulse width.
+    n : int, default: 4001
+        Number of frequencies of the grid, which spans 10 channel widths
+        around the carrier.
+
+    Returns
+    -------
+    plan : dict
+        With the keys `'f_carrier'`, `'bandwidth'` (of the channel),
+        `'in_band'`, `'occupied_bandwidth'`, `'leakage'`, `'filter_loss'`
+        (arrays of the shape of `Tb`), and `'Tb_min'`.
+    """
+    fl, fu = _channel(channel_id)[:2]
+    fc = (fl + fu)/2
+    W = fu - fl
+    f, H = filter_response(channel_id, fc - 5*W, fc + 5*W, n, fs, f_transition, A_pass, A_stop)
+    df = f[1] - f[0]
+    inside = (f >= fl) & (f <= fu)
+
+    Tb = np.asarray(Tb, dtype=float)
+    S = pulse_psd(f, Tb[..., None], fc)
+    Sf = S*np.abs(H)**2
+    P = np.sum(Sf, axis=-1)*df
+
+    # 99 % bandwidth of the filtered signal
+    C = np.cumsum(Sf, axis=-1)*df/P[..., None]
+    bw = df*(np.sum(C < 0.995, axis=-1) - np.sum(C < 0.005, axis=-1))
+
+    plan = {
+        'f_carrier': fc,
+        'bandwidth': W,
+        'in_band': _in_band(channel_id, Tb, n),
+        'occupied_bandwidth': bw,
+        'leakage': 10*np.log10(np.sum(Sf*~inside, axis=-1)*df/P),
+        'filter_loss': 10*np.log10(P),
+        'Tb_min': min_pulse_width(channel_id, in_band, n=n)
+    }
+    return plan
+
+def min_pulse_width(channel_id: int, in_band: float=0.95, Tbs=None, n: int=4001):
+    """
+    Shortest pulse width on the grid `Tbs` (default: 5 to 500 ms in steps of
+    1 ms) for which the in-band fraction (see plan_channel()) is at least
+    `in_band`, also for all longer pulse widths. NaN if there is none.
+    """
+    Tbs = np.arange(0.005, 0.5005, 0.001) if Tbs is None else np.asarray(Tbs)
+    ok = _in_band(channel_id, Tbs, n) >= in_band
+    ok = np.flip(np.logical_and.accumulate(np.flip(ok)))
+    return np.round(Tbs[np.argmax(ok)], 9) if np.any(ok) else np.nan
+
+def _in_band(channel_id: int, Tb, n: int):
+    """
+    Fraction of the power of the unfiltered signal with pulse width(s) `Tb`
+    within the channel. The power spectral density is normalized to unit
+    power, hence only the channel needs to be integrated.
+    """
+    fl, fu = _channel(channel_id)[:2]
+    f, df = np.linspace(fl, fu, n, retstep=True)
+    S = pulse_psd(f, np.asarray(Tb)[..., None], (fl + fu)/2)
+    return (np.sum(S, axis=-1) - (S[..., 0] + S[..., -1])/2)*df
+
+def _channel(channel_id: int):
+    _check_channel(channel_id)
+    return _channels[:, channel_id]
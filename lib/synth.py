@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transmit signal synthesis by overlap-adding precomputed symbol responses.
+
+The transmitter encodes the bits into rect pulses, modulates them onto the
+carrier, and band-limits the result with an IIR filter. All three steps are
+linear (and the filter is time-invariant), hence the transmitted signal is the
+sum of the filtered, modulated responses of the individual symbols. These only
+differ in their sign and the phase of the carrier at the start of the symbol,
+and since
+
+    sin(wc*t + phi) = cos(phi)*sin(wc*t) + sin(phi)*cos(wc*t),
+
+the response of a symbol at any carrier phase is a combination of the
+responses of a sine and a cosine pulse. The Synthesizer computes these once and
+renders a message by adding one template per symbol instead of running the
+modulator and the filter over every sample.
+"""
+
+from collections import OrderedDict
+import numpy as np
+from scipy import signal
+
+
+class Synthesizer:
+    """
+    Renders the band-limited, modulated transmit signal of bit sequences.
+
+    The output is the same as (up to the truncation of the filter's impulse
+    response at the relative tolerance `tol` and the round-off errors of the
+    direct-form filter, which are in the order of 1e-2 for the narrow band-pass
+    filters of the channels)
+
+        xb = wcs.encode_baseband_signal(b, Tb, fs)
+        xm = modulator(A_carrier, f_carrier, xb, fs)
+        xt = signal.lfilter(filter_b, filter_a, np.concatenate((xm, zeros)))
+
+    Only the filtered sine and cosine pulses are stored, the symbols are
+    weighted combinations of them (hence the memory does not depend on the
+    number of distinct carrier phases). The rendered signals of the most
+    recently used messages are kept in a least-recently-used cache of at most
+    `cache_bytes` bytes.
+
+    Parameters
+    ----------
+    Tb : float
+        Pulse width in seconds.
+    fs : float
+        Sampling frequency in Hz.
+    A_carrier : float
+        Amplitude of the carrier.
+    f_carrier : float
+        Carrier frequency in Hz.
+    filter_b, filter_a : numpy.array
+        Coefficients of the band-limiting filter, see modem.filter_bp().
+    tol : float, default: 1e-6
+        The impulse response of the filter is truncated where it has decayed
+        below `tol` times its maximum.
+    cache_bytes : int, default: 64 MiB
+        Size of the cache of rendered messages in bytes.
+    """
+
+    def __init__(self, Tb: float, fs: float, A_carrier: float, f_carrier: float, filter_b, filter_a, tol: float=1e-6, cache_bytes: int=64*2**20):
+        self.Kb = int(np.floor(Tb*fs))
+        self.fs = fs
+        self.f_carrier = f_carrier
+        self.cache_bytes = cache_bytes
+        self.Ntail = _impulse_length(filter_b, filter_a, tol, int(np.round(fs)))
+
+        # Filtered sine and cosine pulses of one symbol (including the tail
+        # of the filter), split into J blocks of Kb samples
+        self.J = -(-(self.Kb + self.Ntail)//self.Kb)
+        m = np.arange(self.Kb)
+        w = 2*np.pi*f_carrier/fs
+        x = np.zeros((2, self.J*self.Kb))
+        x[0, :self.Kb] = A_carrier*np.sin(w*m)
+        x[1, :self.Kb] = A_carrier*np.cos(w*m)
+        self._pulses = signal.lfilter(filter_b, filter_a, x, axis=-1).reshape((2, self.J, self.Kb))
+
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+
+    def template(self, phi: float):
+        """
+        Returns the response of a symbol `1` that starts at carrier phase
+        `phi` (in radians), of shape (J, Kb).
+        """
+        return np.cos(phi)*self._pulses[0] + np.sin(phi)*self._pulses[1]
+
+    def render(self, b, N: int=None):
+        """
+        Renders the transmit signal of the bit sequence `b`, including the
+        synchronization sequence prepended by wcs.encode_baseband_signal().
+
+        Parameters
+        ----------
+        b : numpy.array
+            A binary array of 1s and 0s encoding a message.
+        N : int, optional
+            Length of the output in samples. The signal is truncated or padded
+            with zeros. Defaults to the length of the baseband signal plus the
+            tail of the filter.
+
+        Returns
+        -------
+        xt : numpy.array
+            The transmit signal. The array is read-only since it may be shared
+            with the cache.
+        """
+        b = np.asarray(b, dtype=np.uint8)
+        key = b.tobytes()
+        xt = self._cache.get(key)
+        if xt is None:
+            xt = self._render(b)
+            xt.flags.writeable = False
+            self._insert(key, xt)
+        else:
+            self._cache.move_to_end(key)
+
+        if N is None or N == xt.shape[0]:
+            return xt
+        elif N < xt.shape[0]:
+            return xt[:N]
+        else:
+            xt = np.concatenate((xt, np.zeros((N - xt.shape[0],))))
+            xt.flags.writeable = False
+            return xt
+
+    def _render(self, b):
+        # Symbol values (with the synchronization sequence) and the carrier
+        # phase at the start of each symbol
+        s = 2.0*np.concatenate(([1, 0], b)) - 1
+        M = s.shape[0]
+        k = np.arange(M)
+        phi = np.mod(2*np.pi*self.f_carrier*self.Kb/self.fs*k, 2*np.pi)
+        sc = (s*np.cos(phi))[:, None]
+        ss = (s*np.sin(phi))[:, None]
+
+        # Overlap-add: Block j of the response of symbol k goes to output
+        # block k+j
+        Y = np.zeros((M + self.J - 1, self.Kb))
+        for j in range(self.J):
+            Y[j:j+M] += sc*self._pulses[0, j]
+            Y[j:j+M] += ss*self._pulses[1, j]
+
+        return Y.reshape((-1,))[:M*self.Kb + self.Ntail]
+
+    def _insert(self, key, xt):
+        # Evict the least recently used messages until the new one fits
+        if xt.nbytes > self.cache_bytes:
+            return
+        while self._cached_bytes + xt.nbytes > self.cache_bytes:
+            _, old = self._cache.popitem(last=False)
+            self._cached_bytes -= old.nbytes
+        self._cache[key] = xt
+        self._cached_bytes += xt.nbytes
+
+def _impulse_length(b, a, tol: float, N: int):
+    """
+    Number of samples after which the impulse response of the filter (b, a)
+    has decayed below `tol` times its maximum. The response is evaluated over
+    `N` samples, doubled until the decay is found.
+    """
+    while True:
+        x = np.zeros((N,))
+        x[0] = 1
+        h = np.abs(signal.lfilter(b, a, x))
+        if not np.all(np.isfinite(h)):
+            raise ValueError('The impulse response of the filter does not decay, the filter is unstable.')
+        i = np.flatnonzero(h > tol*np.max(h))
+        if i[-1] < N//2:
+            return int(i[-1]) + 1
+        N = 2*N
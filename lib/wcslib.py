@@ -6,9 +6,12 @@ Library for the wireless communication system project in Signals and Transforms
 2020-present -- Roland Hostettler <roland.hostettler@angstrom.uu.se>
 """
 
+import lzma
+import zlib
 import numpy as np
-from scipy import signal
+from scipy import integrate, signal, stats
 from scipy.stats import chi2
+from .buffers import BufferPool, RingBuffer
 
 # List of channels and their max average power [fl, fu, Pmax]^T
 _channels = np.array([
@@ -17,6 +20,11 @@ _channels = np.array([
     [np.nan,   30,   33,   27,   33,   33,   33,   30,   27,   30,   33,   33,   27,   33,   30,   30,   33,   27,   33,   30,   27, np.nan]
 ])
 
+def _check_channel(channel_id: int):
+    # The first and the last channel are not usable (open-ended bands)
+    if not (channel_id >= 1 and channel_id < _channels.shape[1]-1):
+        raise ValueError(f'channel_id must be between 1 and {_channels.shape[1]-2}, but {channel_id} given.')
+
 def encode_string(instr):
     """
     Converts a string to a binary numpy array.
@@ -52,7 +60,258 @@ def decode_string(inbin):
     outstr = "".join([chr(b) for b in tmp])
     return outstr
 
-def encode_baseband_signal(b, Tb, fs):
+def decode_string_stream(inbin):
+    """
+    Incrementally converts a sequence of bits to characters. This is the
+    incremental counterpart of decode_string(): a character is yielded as soon
+    as the eight bits of its byte have been received, which makes it possible
+    to act on partial messages, for example
+
+        bits = (b for kind, k, b, latency in events if kind == 'bit')
+        for c in decode_string_stream(bits):
+            print(c, end='', flush=True)
+
+    where `events` are the events generated by decode_baseband_stream().
+
+    Parameters
+    ----------
+    inbin : iterable
+        An iterable of ones and zeros (or booleans) encoding a string.
+
+    Yields
+    ------
+    c : str
+        The next decoded character.
+    """
+    byte = 0
+    nbits = 0
+    for bit in inbin:
+        byte = (byte << 1) | int(bit)
+        nbits += 1
+        if nbits == 8:
+            yield chr(byte)
+            byte = 0
+            nbits = 0
+
+# Compression methods of encode_message(), stored in the header byte
+_COMPRESSION = {'raw': 0, 'zlib': 1, 'lzma': 2, 'dict': 3}
+_LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 9 | lzma.PRESET_EXTREME}]
+
+def train_dictionary(samples, size: int=1024, nmin: int=3, nmax: int=32):
+    """
+    Trains a static dictionary for compressing short messages with 
+    encode_message(..., method='dict'). Short messages do not contain enough
+    repetitions to be compressed on their own, but text that is common to
+    many messages can be referenced from a dictionary shared by the 
+    transmitter and the receiver.
+
+    The dictionary is built from the substrings (of `nmin` to `nmax` bytes)
+    that occur in the most sample messages, weighted by their length. 
+    Substrings that are contained in an already chosen one are skipped. The
+    most valuable substrings are put at the end of the dictionary, since 
+    DEFLATE encodes shorter distances with fewer bits.
+
+    Parameters
+    ----------
+    samples : list of str
+        Typical messages.
+    size : int, default: 1024
+        Maximum size of the dictionary in bytes.
+    nmin, nmax : int, default: 3, 32
+        Minimum and maximum length of the substrings.
+
+    Returns
+    -------
+    zdict : bytes
+        The dictionary.
+    """
+    counts = {}
+    for s in samples:
+        s = s.encode('utf-8')
+        grams = {s[i:i+n] for n in range(nmin, nmax+1) for i in range(len(s)-n+1)}
+        for g in grams:
+            counts[g] = counts.get(g, 0) + 1
+
+    # Only substrings that occur in more than one message are useful
+    ranked = sorted((g for g in counts if counts[g] > 1), key=lambda g: counts[g]*len(g), reverse=True)
+    chosen = []
+    n = 0
+    for g in ranked:
+        if n + len(g) > size:
+            continue
+        if any(g in c for c in chosen):
+            continue
+        chosen.append(g)
+        n += len(g)
+
+    return b''.join(reversed(chosen))
+
+def encode_message(instr, method: str='auto', zdict: bytes=None, Tb: float=None, full_output: bool=False):
+    """
+    Converts a string to a binary numpy array like encode_string(), but
+    optionally compresses it first to reduce the air-time of the message.
+
+    The UTF-8 encoded string is compressed using raw DEFLATE (`'zlib'`), raw
+    LZMA2 (`'lzma'`), or DEFLATE with the static dictionary `zdict` 
+    (`'dict'`, see train_dictionary()), and a header byte that identifies the 
+    method is prepended. For the dictionary method, a second header byte 
+    holds a checksum of the dictionary, such that decoding with a different
+    dictionary is detected. With `'auto'`, the shortest of the available 
+    encodings is used (which may also be the uncompressed `'raw'`). The 
+    message is decoded by decode_message().
+
+    Parameters
+    ----------
+    instr : str
+        The message.
+    method : str, default: 'auto'
+        One of `'auto'`, `'raw'`, `'zlib'`, `'lzma'`, and `'dict'`.
+    zdict : bytes, optional
+        Static dictionary, required for the method `'dict'`.
+    Tb : float, optional
+        Pulse width in seconds, used to calculate the air-time in the report.
+    full_output : bool, default: False
+        If True, also returns a report of the compression.
+
+    Returns
+    -------
+    binary : numpy.array
+        A binary array encoding the (compressed) message.
+    report : dict
+        Only returned if `full_output` is True. Contains the keys `'method'`,
+        `'raw_bits'` and `'coded_bits'` (number of bits of the uncompressed 
+        string as by encode_string() and of the encoded message, including 
+        the header), `'ratio'` (raw_bits/coded_bits), and, if `Tb` is given, 
+        `'airtime'` and `'airtime_saved'` (in seconds).
+    """
+    data = instr.encode('utf-8')
+    if method == 'auto':
+        methods = ['raw', 'zlib', 'lzma'] + (['dict'] if zdict is not None else [])
+    elif method in _COMPRESSION:
+        methods = [method]
+    else:
+        raise ValueError(f"method must be one of 'auto', {', '.join(map(repr, _COMPRESSION))}, but '{method}' given.")
+
+    coded = [_compress(data, m, zdict) for m in methods]
+    i = int(np.argmin([len(c) for c in coded]))
+    binary = np.unpackbits(np.frombuffer(coded[i], dtype=np.uint8))
+
+    if full_output:
+        raw_bits = 8*len(data)
+        report = {
+            'method': methods[i],
+            'raw_bits': raw_bits,
+            'coded_bits': binary.shape[0],
+            'ratio': raw_bits/binary.shape[0]
+        }
+        if Tb is not None:
+            report['airtime'] = binary.shape[0]*Tb
+            report['airtime_saved'] = (raw_bits - binary.shape[0])*Tb
+        return binary, report
+    else:
+        return binary
+
+def decode_message(inbin, zdict: bytes=None):
+    """
+    Converts a binary numpy array generated by encode_message() back to the
+    message, decompressing it according to its header. Trailing bits (for 
+    example, bits decoded after the end of the transmission) are ignored by 
+    the compressed encodings.
+
+    Parameters
+    ----------
+    inbin : numpy.array
+        A binary array of ones and zeros encoding a message.
+    zdict : bytes, optional
+        Static dictionary, required for messages compressed with it.
+
+    Returns
+    -------
+    outstr : str
+        The message. Invalid UTF-8 sequences are replaced.
+
+    Raises
+    ------
+    ValueError
+        If the header is invalid, or if a compressed message is corrupted or
+        truncated (for example, because the signal was lost).
+    """
+    data = np.packbits(np.asarray(inbin, dtype=np.uint8)).tobytes()
+    if len(data) == 0:
+        return ""
+    method = data[0]
+    if method == _COMPRESSION['raw']:
+        return data[1:].decode('utf-8', errors='replace')
+    elif method == _COMPRESSION['zlib']:
+        d = zlib.decompressobj(-15)
+        payload = data[1:]
+    elif method == _COMPRESSION['lzma']:
+        d = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+        payload = data[1:]
+    elif method == _COMPRESSION['dict']:
+        if zdict is None or len(data) < 2 or data[1] != zlib.adler32(zdict) & 0xff:
+            raise ValueError('The message was compressed with a different dictionary.')
+        d = zlib.decompressobj(-15, zdict=zdict)
+        payload = data[2:]
+    else:
+        raise ValueError(f'Unknown compression method {method} in the message header.')
+
+    try:
+        out = d.decompress(payload)
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f'Corrupted message: {e}') from e
+    if not d.eof:
+        raise ValueError('Truncated message: The compressed stream does not end.')
+
+    return out.decode('utf-8', errors='replace')
+
+def _compress(data: bytes, method: str, zdict: bytes=None):
+    """
+    Compresses `data` with the given method of encode_message() and prepends
+    the header.
+    """
+    header = bytes([_COMPRESSION[method]])
+    if method == 'raw':
+        return header + data
+    elif method == 'zlib':
+        c = zlib.compressobj(9, zlib.DEFLATED, -15)
+        return header + c.compress(data) + c.flush()
+    elif method == 'lzma':
+        return header + lzma.compress(data, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+    else:
+        if zdict is None:
+            raise ValueError("The method 'dict' requires a dictionary.")
+        c = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=zdict)
+        return header + bytes([zlib.adler32(zdict) & 0xff]) + c.compress(data) + c.flush()
+
+def pad_batch(x, fill=0):
+    """
+    Stacks a list of one-dimensional arrays of (possibly) different lengths 
+    into a two-dimensional array, where the shorter arrays are padded at the
+    end. The result can be used as the batch input of the encoding, decoding, 
+    and channel simulation functions.
+
+    Parameters
+    ----------
+    x : list of numpy.array
+        The arrays to stack.
+    fill : scalar, default: 0
+        Padding value.
+
+    Returns
+    -------
+    X : numpy.array
+        Array with one row per array in `x`.
+    lengths : numpy.array
+        Lengths of the arrays.
+    """
+    lengths = np.array([xi.shape[0] for xi in x])
+    X = np.full((len(x), np.max(lengths)), fill, dtype=np.result_type(*x))
+    for i, xi in enumerate(x):
+        X[i, :lengths[i]] = xi
+    return X, lengths
+
+def encode_baseband_signal(b, Tb, fs, lengths=None):
     """
     Encodes a binary sequence into a baseband signal. In particular, generates 
     a discrete-time signal that encodes the binary signal `b` into pulses of 
@@ -72,155 +331,1018 @@ def encode_baseband_signal(b, Tb, fs):
     decoder (on the receiving side) to determine the time delay between the 
     sender and receiver to synchronize the decoding process with the signal. 
 
+    Several messages can be encoded at once by stacking them along the leading
+    dimensions of `b` (see also pad_batch()). If the messages are of different
+    lengths, the signals are set to zero after the end of each message.
+
     Parameters
     ----------
     b : numpy.array
-        A binary array of 1s and 0s encoding a message.
+        A binary array of 1s and 0s encoding a message, or an array of shape 
+        (..., Nbits) of several messages.
     Tb : float
         Pulse width in seconds to encode the bits to.
     fs : float
         Sampling frequency in Hz.
+    lengths : numpy.array, optional
+        Number of bits of each message for messages of different lengths, of 
+        shape (...).
 
     Returns
     -------
     xb : numpy.array
-        Encoded baseband signal.
+        Encoded baseband signal(s).
+    lengths : numpy.array
+        Only returned if `lengths` is given. Length of each encoded signal in 
+        samples.
     """
 
-    # Prepend synchronization sequence and a trailing zero
-    b = np.concatenate(([1, 0], b))
+    # Prepend synchronization sequence
+    b = np.asarray(b)
+    b = np.concatenate((np.broadcast_to([1, 0], b.shape[:-1] + (2,)), b), axis=-1)
 
     # Encode bit values
-    s = [-1, 1]
-    b[b == 0] = s[0]
-    b[b == 1] = s[1]
+    s = 2.0*b - 1
 
-    # Expand
+    # Expand to rect pulses of width Kb (this is the same as "lowpass 
+    # filtering" pulses at every Kb with a rect of length Kb)
     Kb = int(np.floor(Tb*fs))
-    Nx = b.shape[0]
-    xb = np.zeros(Nx*Kb)
-    xb[np.arange(0, Nx*Kb, Kb)] = b
-
-    # "Lowpass filtering"
-    b = np.ones(Kb)
-    xb = signal.lfilter(b, 1, xb)
+    xb = np.repeat(s, Kb, axis=-1)
 
-    return xb
+    if lengths is not None:
+        lengths = (np.asarray(lengths) + 2)*Kb
+        xb[np.arange(xb.shape[-1]) >= lengths[..., None]] = 0
+        return xb, lengths
+    else:
+        return xb
 
-def decode_baseband_signal(xm, xp, Tb: float, fs: float):
+def decode_baseband_signal(xb, Tb: float, fs: float, Bn: float=0.15, Bt: float=0.01, full_output: bool=False, lengths=None, executor=None, buffers=None, soft: bool=False):
     """
-    Decodes an IQ-demodulated baseband signal consisting of a magnitude signal
-    `xm` and a phase signal `xp` into a binary bit sequence.
+    Decodes a complex-valued, IQ-demodulated baseband signal `xb` into a
+    binary bit sequence.
     
     The bit sequence is recovered by first determining the window of the 
-    transmission. This is achieved by averaging the magnitude signal over a 
-    sliding window of the length of a symbol (`Tb`) (implemented using a filter
-    with a rect of length `Tb` as the impulse response). Then, the average 
-    is compared to a threshold, where the threshold is determined using the 
-    tail probability of a chi-squared distribution (in essence, the test checks
-    whether there is a signal or only noise with a probability of 99 %).
-
-    Then, a filter with impulse response consisting of two pulses corresponding
-    to the mirrored synchronization sequence is used to find the first 
-    occurence of this pulse sequence in the signal. This corresponds to 
-    correlating the signal with the synchronization sequence and is used to 
-    determine the time delay introduced by filters and the transmission itself
-    (i.e., to synchronize the data stream).
-    
-    Next, the (averaged) phases of the first two bits are used to find a 
-    complex representation of the symbols (which will be different from -1 and
-    1 due to the phase shift introduced the transmission and filtering).
+    transmission. This is achieved by averaging the squared magnitude of the
+    signal over a sliding window of the length of a symbol (`Tb`) (implemented
+    using a filter with a rect of length `Tb` as the impulse response). Then,
+    the average is compared to a threshold, where the threshold is determined
+    using the tail probability of a chi-squared distribution (in essence, the
+    test checks whether there is a signal or only noise with a probability of
+    99 %).
 
-    Finally, the whole phase signal is converted to a complex number with angle
-    corresponding to the phase shift and bit values are determined by comparing
-    averages of length `Tb` to the previously recovered symbols.
+    Then, the signal is averaged over a sliding window of the length of a
+    symbol, which yields the complex symbol value at the end of each symbol.
+    The synchronization sequence [1, 0] is found as the first point (after the
+    detection) where two consecutive averaged symbols point in opposite
+    directions, which determines the time delay introduced by filters and the
+    transmission itself (i.e., to synchronize the data stream). The second
+    synchronization symbol (the bit `0`) also gives the initial phase of the
+    symbol for the bit `1`.
+
+    Finally, the bits are recovered symbol by symbol using a decision-directed
+    Costas loop: Each averaged symbol is rotated by the tracked carrier phase
+    and the bit is decided by the sign of the real part. The residual phase of
+    the rotated symbol with respect to the decision is then used to update the
+    phase and frequency estimates of the loop (a second-order phase-locked
+    loop). This way, a residual carrier frequency offset between the
+    transmitter and the receiver (which rotates the symbols over time) is
+    tracked throughout the transmission.
+
+    Similarly, the sampling instant of each symbol is adjusted by a timing-
+    recovery loop based on the Gardner timing-error detector: The averaged
+    signal halfway between two symbols is zero if the symbols are sampled at
+    the right time and there is a transition between them. Otherwise, its
+    projection onto the difference of the two symbols gives the timing error,
+    which is used to update the sampling instant and the estimate of the 
+    symbol length (i.e., the sampling clock offset between the transmitter and
+    the receiver). Since the averaged signal is only sampled at the (fractional)
+    sampling instants, it is interpolated linearly between the samples.
+
+    Several signals can be decoded at once by stacking them along the leading
+    dimensions of `xb` (see also pad_batch()). All the steps are then carried
+    out for all the signals at once, and the bits are returned as a padded 
+    array together with the number of bits of each signal.
 
     Parameters
     ----------
-    xm : numpy.array
-        The magnitude of the IQ-demodulated baseband signal.
-    xp : numpy.array
-        The phase of the IQ-demodulated baseband signal.
+    xb : numpy.array
+        The complex IQ-demodulated baseband signal, or an array of shape 
+        (..., N) of several signals.
     Tb : float
         Pulse width in seconds to encode the bits to.
     fs : float
         Sampling frequency in Hz.
+    Bn : float, default: 0.15
+        Noise bandwidth of the phase-tracking loop, normalized to the symbol
+        rate.
+    Bt : float, default: 0.01
+        Noise bandwidth of the timing-recovery loop, normalized to the symbol
+        rate.
+    full_output : bool, default: False
+        If True, also returns a dictionary with information about the decoded
+        frame.
+    lengths : numpy.array, optional
+        Number of samples of each signal for signals of different lengths, of
+        shape (...). The samples after the end of each signal are ignored.
+    executor : concurrent.futures.Executor, optional
+        If given, the averaging of the detection and the synchronization run
+        concurrently on the executor. The result is the same.
+    buffers : buffers.BufferPool, optional
+        Pool for the scratch arrays of the detection and the averaging. When
+        decoding signals of the same size repeatedly, passing the same pool
+        avoids allocating them for every call.
+    soft : bool, default: False
+        If True, also returns the soft decisions and detection statistics of
+        the bits.
 
     Returns
     -------
     b : numpy.array
-        A binary array of 1s and 0s encoding a message.
+        A binary array of 1s and 0s encoding a message. For several signals, 
+        an array of shape (..., Nbits), padded with zeros after the end of 
+        each message.
+    nbits : numpy.array
+        Only returned for several signals. Number of bits of each message.
+    info : dict
+        Only returned if `full_output` is True. Contains the following keys
+        (arrays of shape (...) for several signals):
+
+        * `'k0'`: Index of the end of the synchronization sequence,
+        * `'clock_offset'`: Estimated sampling clock offset of the receiver
+          with respect to the transmitter in ppm,
+        * `'carrier_offset'`: Estimated carrier frequency offset in Hz, and
+        * the link quality estimated from the decided symbols, see 
+          _link_quality(): `'snr'` (signal-to-noise ratio of the averaged 
+          symbols in dB), `'evm'` (root-mean-square error vector magnitude
+          relative to the symbol amplitude), and `'margin'` (smallest 
+          projection of a symbol onto the decision, relative to the symbol
+          amplitude; close to zero if at least one bit was a coin flip).
+    soft : dict
+        Only returned if `soft` is True. Contains the following keys (arrays
+        of the shape of `b`, padded with zeros like `b`):
+
+        * `'llr'`: Log-likelihood ratio log(P(1)/P(0)) of each bit, see 
+          _llr(). The sign is the decided bit and the magnitude its 
+          reliability.
+        * `'detection'`: Averaged power at the sampling instant of each bit
+          relative to the detection threshold (greater than 1 where a signal
+          is detected).
     """
 
-    # 1. Signal detection
+    # Work on a (B, N) array of signals (and their lengths)
+    xb = np.asarray(xb)
+    shape = xb.shape[:-1]
+    xb = xb.reshape((-1, xb.shape[-1]))
+    B, N = xb.shape
+    rows = np.arange(B)
+    L = np.full((B,), N) if lengths is None else np.asarray(lengths).reshape((-1,))
+    buffers = BufferPool() if buffers is None else buffers
+
+    # The averaging of the power (for detection) and of the signal (for 
+    # synchronization and decoding) are independent, start both at once
     Kb = int(np.floor(Tb*fs))
-    hd = np.ones((Kb,))
-    xm2 = signal.lfilter(hd, 1, xm**2)
-    xm_var = np.var(xm)
-    xtest = chi2.cdf(xm2/xm_var, 2*Kb)
-    d = xtest > 0.99
-    m = np.argmax(d)
+    xm = np.abs(xb, out=buffers.get('xm', (B, N)))
+    x2 = np.square(xm, out=buffers.get('x2', (B, N)))
+    xm2 = buffers.get('xm2', (B, N))
+    xx = buffers.get('xx', (B, N), np.result_type(xb.dtype, float))
+    if executor is not None:
+        fm2 = executor.submit(_moving_sum, x2, Kb, xm2)
+        fxx = executor.submit(_moving_sum, xb, Kb, xx)
+    else:
+        _moving_sum(x2, Kb, xm2)
+        _moving_sum(xb, Kb, xx)
+
+    # 1. Signal detection. The samples after the end of each signal are 
+    # masked out (only if there are signals of different lengths).
+    if lengths is not None:
+        valid = np.less(np.arange(N), L[:, None], out=buffers.get('valid', (B, N), bool))
+        xm *= valid
+    xm_mean = np.sum(xm, axis=-1)/L
+    xv = np.subtract(xm, xm_mean[:, None], out=buffers.get('xv', (B, N)))
+    if lengths is not None:
+        xv *= valid
+    xm_var = np.sum(np.square(xv, out=xv), axis=-1)/L
+
+    # The chi-squared test chi2.cdf(xm2/xm_var, 2*Kb) > 0.99 is a threshold on
+    # xm2
+    if executor is not None:
+        fm2.result()
+    gamma = chi2.ppf(0.99, 2*Kb)*xm_var
+    d = np.greater(xm2, gamma[:, None], out=buffers.get('d', (B, N), bool))
+    if lengths is not None:
+        d &= valid
+    m = np.argmax(d, axis=-1)
 
     # 2. Synchronization
-    # Synchronize using a matched filter. N.B: Expects the first to bits to be
-    # [1, 0] as prepended by encode_baseband_signal()
-    # NOTE: Remove unwrapping? by doing this in the complex domain as well.
-    # NOTE: Synchronization sequence is hardcoded here.
-    xpd = _unwrap(xp)
-    hb = 1/(2*Kb)*np.concatenate((-np.ones(Kb), np.ones(Kb)))
-    xd = np.sign(xpd)*d
-    xs = signal.lfilter(hb, 1, xd)
-    
-    # The peak of the synchronization sequence is within m+Nsynch*Kb. Hence, we
-    # can get an exact match within that window to get "perfect" 
-    # synchronization
-    # NOTE: "2" is hardcoded here, assumes two synchronization bits.
-    k0 = np.argmax(abs(xs[:m+2*Kb]))
-    xx = np.vstack((
-        1/Kb*signal.lfilter(hd, 1, np.cos(xp)),
-        1/Kb*signal.lfilter(hd, 1, np.sin(xp))
-    ))
-    b1 = xx[:, k0-Kb]
-    b0 = xx[:, k0]
+    # N.B: Expects the first to bits to be [1, 0] as prepended by 
+    # encode_baseband_signal()
+    if executor is not None:
+        fxx.result()
+    xx *= 1/Kb
+    k0 = _synchronize(xx, d, m, Kb)
+    theta = np.angle(-xx[rows, k0])
+    omega = np.zeros((B,))
+    A2 = (abs(xx[rows, k0-Kb])**2 + abs(xx[rows, k0])**2)/2
 
     # 3. Recover the bits
-    # Calculate th projection of the complex number onto the symbol of the bit
-    # `1` (b1; inner product), at every Kb starting from k0. Then, remove bits 
-    # where no signal was detected (radio silence) and threshold to get ones 
-    # and zeros (the inner product is close to 1 if the bit is close to the 
-    # symbol for `1`` or close to -1 if the bit is close to the symbol for 
-    # `0`).
-    b = b1@xx[:, k0+Kb::Kb]
-    b = b[d[k0+Kb::Kb]] > 0
+    # Track the phase of the symbol for the bit `1` and the sampling instants 
+    # at every (approximately) Kb starting from k0 and decide the bits by 
+    # projecting the symbols onto it. Bits where no signal was detected (radio
+    # silence) are removed. The loops run for all the signals in parallel 
+    # until the end of the longest signal.
+    Kp, Ki = _loop_gains(Bn)
+    Kpt, Kit = _loop_gains(Bt)
+    t = k0.astype(float)
+    nu = np.zeros((B,))
+    y0 = xx[rows, k0]
+    b = []
+    r = []
+    stat = []
+    keep = []
+    run = t + Kb + nu < L - 1
+    while np.any(run):
+        t1 = np.where(run, t + Kb + nu, t)
+        y1 = _interp(xx, t1)
+        k1 = np.round(t1).astype(int)
+        active = run & d[rows, k1]
+        ym = _interp(xx, (t+t1)/2)
+        bk, rk, theta1, omega1 = _track_phase(y1, theta, omega, Kp, Ki)
+        t2, nu1 = _track_timing(y0, ym, y1, t1, nu, A2, Kb, Kpt, Kit)
+        theta = np.where(active, theta1, theta)
+        omega = np.where(active, omega1, omega)
+        nu = np.where(active, nu1, nu)
+        t = np.where(active, t2, t1)
+        y0 = np.where(run, y1, y0)
+        b.append(bk)
+        r.append(rk)
+        stat.append(xm2[rows, k1]/gamma)
+        keep.append(active)
+        run = t + Kb + nu < L - 1
+
+    # Collect the kept bits of each signal
+    b = np.array(b, dtype=bool).reshape((-1, B)).T
+    r = np.array(r, dtype=complex).reshape((-1, B)).T
+    keep = np.array(keep, dtype=bool).reshape((-1, B)).T
+    nbits = np.sum(keep, axis=-1)
+    bits = np.zeros((B, np.max(nbits, initial=0)), dtype=bool)
+    packed = np.arange(bits.shape[1]) < nbits[:, None]
+    bits[packed] = b[keep]
+    llr = np.zeros(bits.shape)
+    llr[packed] = _llr(r, keep)[keep]
+    detection = np.zeros(bits.shape)
+    detection[packed] = np.array(stat).reshape((-1, B)).T[keep]
+
+    if len(shape) == 0:
+        bits = bits[0, :nbits[0]]
+        info = _frame_info(k0[0], nu[0], omega[0], r[0], keep[0], Kb, fs)
+        sd = {'llr': llr[0, :nbits[0]], 'detection': detection[0, :nbits[0]]}
+        out = (bits,)
+    else:
+        bits = bits.reshape(shape + bits.shape[-1:])
+        info = _frame_info(k0.reshape(shape), nu.reshape(shape), omega.reshape(shape), r.reshape(shape + r.shape[-1:]), keep.reshape(shape + keep.shape[-1:]), Kb, fs)
+        sd = {'llr': llr.reshape(bits.shape), 'detection': detection.reshape(bits.shape)}
+        out = (bits, nbits.reshape(shape))
+
+    if full_output:
+        out = out + (info,)
+    if soft:
+        out = out + (sd,)
+    return out if len(out) > 1 else out[0]
+
+def decode_baseband_stream(blocks, Tb: float, fs: float, threshold: float=None, noise_power: float=None, noise_dof: float=None, Tcal: float=0.5, Bn: float=0.15, Bt: float=0.01, soft: bool=False, min_llr: float=None, Nconf: int=8):
+    """
+    Incrementally decodes an IQ-demodulated baseband signal that arrives in
+    blocks of samples, for example from an audio input stream. This is the
+    incremental counterpart of decode_baseband_signal(): Instead of returning
+    the bits after the whole signal has been processed, events are generated
+    as soon as the samples they depend on have been received.
+
+    The decoding follows the same steps as decode_baseband_signal(), with the
+    exception of the signal detection: Since the variance of the whole signal
+    is not available, the (averaged) power of the signal is compared to the
+    noise floor instead. The noise floor is the average power of the
+    first `Tcal` seconds of the stream (which hence must not contain a
+    transmission), unless it is given by `noise_power`.
+
+    Unless a fixed `threshold` is given, the detection threshold is derived
+    from the statistics of the noise like the chi-squared test of 
+    decode_baseband_signal(): The power of the noise summed over a symbol is
+    approximately chi-squared distributed, but since the samples of the 
+    low-pass filtered noise are correlated, with fewer than 2*Kb degrees of
+    freedom (see _noise_stats()). These are estimated from the first `Tcal`
+    seconds as well, unless given by `noise_dof`. The threshold is the 
+    99.999 % quantile of that distribution. A frame ends when the power has
+    been below the threshold for a whole symbol, such that a single weak 
+    symbol does not end the frame.
+
+    Each event is a tuple `(kind, k, value, latency)` where `k` is the
+    (absolute) sample index the event refers to and `latency` is the time in
+    seconds from sample `k` to the emission of the event (i.e., the amount of
+    signal that had been received after sample `k` when the event was
+    generated). The following kinds of events are generated:
+
+    * `'detect'`: A signal was detected at sample `k` (`value` is None),
+    * `'sync'`: The decoder was synchronized; `k` is the end of the
+      synchronization sequence (`k0` in decode_baseband_signal()),
+    * `'bit'`: A bit was decoded; `k` is the end of the symbol and `value` is
+      the bit, or the tuple `(bit, llr)` if `soft` is True,
+    * `'end'`: The signal was lost at sample `k` (and not detected again
+      within a symbol); `value` is a dictionary with
+      information about the frame (see the `info` output of 
+      decode_baseband_signal()). The decoder then starts looking for the next
+      transmission, and
+    * `'abort'`: The decoding of the frame was aborted at sample `k` since 
+      the confidence dropped below `min_llr`; `value` is the frame 
+      information as for `'end'`. The rest of the frame is skipped, and the
+      decoder starts looking for the next transmission once the signal is 
+      lost.
+
+    The log-likelihood ratio (LLR) of each bit is calculated as in 
+    decode_baseband_signal() (see _llr()), but with the symbol amplitude and 
+    the error vector power estimated from the `Nconf` preceding bits of the
+    frame (excluding the bit itself). Hence, the LLRs of the first `Nconf` 
+    bits of a frame are NaN. The confidence is the average magnitude of the
+    last `Nconf` LLRs, which is about 4 times the signal-to-noise ratio of 
+    the symbols (see _link_quality()). Once `Nconf` LLRs are available (that
+    is, after 2*`Nconf` bits), the frame is aborted if the confidence is 
+    below `min_llr`, for example, because the transmitter stopped or the 
+    link is too bad to decode the frame, instead of decoding garbage until 
+    the end of the signal.
+
+    Parameters
+    ----------
+    blocks : iterable
+        An iterable of consecutive blocks of the complex IQ-demodulated
+        baseband signal. The blocks may be of arbitrary (also varying) 
+        lengths.
+    Tb : float
+        Pulse width in seconds to encode the bits to.
+    fs : float
+        Sampling frequency in Hz.
+    threshold : float, optional
+        Detection threshold in dB above the noise floor. If None, the 
+        threshold is derived from the statistics of the noise, see above.
+    noise_power : float, optional
+        Power of the noise in the baseband signal. If given, the noise floor
+        is not estimated from the signal.
+    noise_dof : float, optional
+        Degrees of freedom of the noise power summed over a symbol, see 
+        _noise_stats(). Only used if `threshold` is None. If `noise_power` 
+        and `noise_dof` are given, no part of the stream is used for the
+        calibration.
+    Tcal : float, default: 0.5
+        Duration (in seconds) of the initial, signal-free part of the stream
+        used to initialize the noise floor (and its degrees of freedom).
+    Bn : float, default: 0.15
+        Noise bandwidth of the phase-tracking loop, normalized to the symbol
+        rate.
+    Bt : float, default: 0.01
+        Noise bandwidth of the timing-recovery loop, normalized to the symbol
+        rate.
+    soft : bool, default: False
+        If True, the `'bit'` events also contain the LLR of the bit.
+    min_llr : float, optional
+        Minimum confidence, see above. If None, frames are never aborted.
+    Nconf : int, default: 8
+        Number of bits over which the confidence is averaged.
+
+    Yields
+    ------
+    event : tuple
+        `(kind, k, value, latency)`, see above.
+    """
+
+    Kb = int(np.floor(Tb*fs))
+    Kp, Ki = _loop_gains(Bn)
+    Kpt, Kit = _loop_gains(Bt)
+    calibrate = noise_power is None or (threshold is None and noise_dof is None)
+    Ncal = int(np.round(Tcal*fs)) if calibrate else 0
+
+    # The last Kb samples of the power and the signal for the running sums 
+    # of the averaging (see _moving_sum()), the samples of the calibration,
+    # and the threshold on the summed power (once calibrated)
+    hx2 = RingBuffer(2*Kb)
+    hx2.append(np.zeros((Kb,)))
+    hxb = RingBuffer(2*Kb, dtype=complex)
+    hxb.append(np.zeros((Kb,), dtype=complex))
+    xcal = RingBuffer(Ncal, dtype=complex)
+    gamma = None
+
+    # History of the detection and averaged signals starting at sample n0 and
+    # the total number of samples received. The history is kept in ring 
+    # buffers and the per-block scratch arrays in a pool, which are reused 
+    # for every block.
+    n0 = 0
+    n = 0
+    hdet = RingBuffer(4*Kb, dtype=bool)
+    hxx = RingBuffer(4*Kb, dtype=complex)
+    buffers = BufferPool()
+
+    # Decoder state: 'idle' (looking for a signal starting at sample `k`),
+    # 'sync' (signal detected at sample `m`), 'bits' (last symbol sampled
+    # at `t` (sample `k`), tracked carrier phase `theta` and increment 
+    # `omega`, and symbol length deviation `nu`), and 'skip' (aborted, 
+    # waiting for the signal to be lost after sample `k`). For the 
+    # confidence, the LLR magnitudes `llrs` of the last `Nconf` bits are
+    # kept.
+    state = 'idle'
+    k = Ncal
+    m = None
+    k0 = None
+    theta = 0.0
+    omega = 0.0
+    t = 0.0
+    nu = 0.0
+    y0 = 0.0
+    A2 = 1.0
+    rs = []
+    llrs = np.zeros((Nconf,))
+
+    for xb in blocks:
+        xb = np.asarray(xb, dtype=complex)
+        N = xb.shape[0]
+        if N == 0:
+            continue
+
+        # 1. Signal detection against the noise floor, which is calibrated on
+        # the first Ncal samples
+        ical = min(max(Ncal-n, 0), N)
+        xcal.append(xb[:ical])
+        if gamma is None and n + ical >= Ncal:
+            P, dof = _noise_stats(xcal.data, Kb) if calibrate else (noise_power, noise_dof)
+            P = noise_power if noise_power is not None else P
+            dof = noise_dof if noise_dof is not None else dof
+            if threshold is None:
+                gamma = chi2.ppf(0.99999, dof)*Kb*P/dof
+            else:
+                gamma = Kb*10**(threshold/10)*P
+        x2 = np.abs(xb, out=buffers.get('x2', (N,)))
+        x2 = np.square(x2, out=x2)
+        xm2 = _moving_sum(x2, Kb, buffers.get('xm2', (N,)), hx2.data)
+        d = np.greater(xm2, np.inf if gamma is None else gamma, out=buffers.get('d', (N,), bool))
+        d[:ical] = False
+
+        xx = _moving_sum(xb, Kb, buffers.get('xx', (N,), complex), hxb.data)
+        xx *= 1/Kb
+        hdet.append(d)
+        hxx.append(xx)
+        n += N
+        for h, x in ((hx2, x2), (hxb, xb)):
+            h.append(x[-Kb:])
+            h.discard(len(h) - Kb)
+
+        while True:
+            if state == 'idle':
+                # Look for the first detection from sample k onwards
+                i = np.flatnonzero(hdet.data[k-n0:])
+                if i.shape[0] == 0:
+                    k = n
+                    break
+                m = k + i[0]
+                state = 'sync'
+                yield ('detect', m, None, (n-1-m)/fs)
 
-    return b
+            elif state == 'skip':
+                # Skip the rest of an aborted frame, that is, until the signal
+                # has been lost for a symbol
+                i = np.flatnonzero(~hdet.data[k-n0:])
+                if i.shape[0] == 0:
+                    k = n
+                    break
+                k = k + i[0]
+                if n < k+Kb:
+                    break
+                i = np.flatnonzero(hdet.data[k-n0:k+Kb-n0])
+                if i.shape[0] == 0:
+                    state = 'idle'
+                else:
+                    k = k + i[-1] + 1
 
-def _unwrap(xp, alpha: float=np.pi/8):
+            elif state == 'sync':
+                # 2. Synchronization, see decode_baseband_signal(). Requires
+                # the samples up to m+2*Kb.
+                if n < m+2*Kb:
+                    break
+                k0 = n0 + int(_synchronize(hxx.data, hdet.data, m-n0, Kb))
+                theta = np.angle(-hxx.data[k0-n0])
+                omega = 0.0
+                A2 = (abs(hxx.data[k0-Kb-n0])**2 + abs(hxx.data[k0-n0])**2)/2
+                y0 = hxx.data[k0-n0]
+                t = float(k0)
+                nu = 0.0
+                k = k0
+                rs = []
+                state = 'bits'
+                yield ('sync', k0, None, (n-1-k0)/fs)
+
+            else:
+                # 3. Recover the bits as long as the signal is detected
+                t1 = t + Kb + nu
+                if t1 >= n-1:
+                    break
+                k = int(np.round(t1))
+                if not hdet.data[k-n0]:
+                    # The frame ends if the signal is not detected again 
+                    # within a symbol
+                    if n < k+Kb:
+                        break
+                if not np.any(hdet.data[k-n0:k+Kb-n0]):
+                    state = 'idle'
+                    info = _frame_info(k0, nu, omega, np.array(rs), np.ones((len(rs),), dtype=bool), Kb, fs)
+                    yield ('end', k, info, (n-1-k)/fs)
+                    continue
+                y1 = _interp(hxx.data, t1-n0)
+                ym = _interp(hxx.data, (t+t1)/2-n0)
+                b, r, theta, omega = _track_phase(y1, theta, omega, Kp, Ki)
+                t, nu = _track_timing(y0, ym, y1, t1, nu, A2, Kb, Kpt, Kit)
+                y0 = y1
+
+                # Soft decision from the statistics of the preceding Nconf 
+                # bits, and the confidence over the last Nconf LLRs
+                if len(rs) >= Nconf:
+                    A, Pe = _symbol_stats(np.array(rs[-Nconf:]), np.ones((Nconf,), dtype=bool))
+                    llr = 4*A*r.real/Pe if Pe > 0 else np.sign(r.real)*np.inf
+                else:
+                    llr = np.nan
+                rs.append(r)
+                llrs[len(rs) % Nconf] = abs(llr)
+                yield ('bit', k, (bool(b), llr) if soft else bool(b), (n-1-k)/fs)
+
+                if min_llr is not None and len(rs) >= 2*Nconf and np.mean(llrs) < min_llr:
+                    state = 'skip'
+                    info = _frame_info(k0, nu, omega, np.array(rs), np.ones((len(rs),), dtype=bool), Kb, fs)
+                    yield ('abort', k, info, (n-1-k)/fs)
+
+        # Discard the history that is not needed anymore
+        i = max((m if state == 'sync' else k) - Kb - n0, 0)
+        hdet.discard(i)
+        hxx.discard(i)
+        n0 += i
+
+def _noise_stats(x, Kb: int):
+    """
+    Estimates the power `P` of the complex noise `x` and the degrees of 
+    freedom `dof` of its power summed over `Kb` samples, which is 
+    approximately chi-squared distributed with `dof` degrees of freedom (and
+    mean Kb*P). For white noise, dof = 2*Kb, but the samples of low-pass 
+    filtered noise are correlated. For complex Gaussian noise with the 
+    autocorrelation R(l), the variance of the sum is
+
+        Kb*sum_{|l| < Kb} (1 - |l|/Kb)*|R(l)|^2,
+
+    and matching the mean and the variance of a scaled chi-squared 
+    distribution yields dof = 2*(Kb*P)^2/variance.
+    """
+    M = x.shape[-1]
+    X = np.fft.fft(x, 2*M)
+    R = np.fft.ifft(X.real**2 + X.imag**2)[:min(Kb, M)]/M
+    P = R[0].real
+    w = 1 - np.arange(R.shape[0])/Kb
+    var = Kb*(P**2 + 2*np.sum(w[1:]*np.abs(R[1:])**2))
+    return P, min(2*(Kb*P)**2/var, 2*Kb)
+
+def _synchronize(xx, d, m: int, Kb: int):
+    """
+    Finds the end of the synchronization sequence [1, 0] in the averaged 
+    baseband signal. Since the synchronization sequence starts before the
+    signal is detected at sample `m`, its end is within m+2*Kb. Within that
+    window, the synchronization sequence ends where the averaged symbol is 
+    opposite to the one a symbol earlier (both within the detected signal).
+
+    Parameters
+    ----------
+    xx : numpy.array
+        Complex baseband signal averaged over a symbol, of shape (..., N).
+    d : numpy.array
+        Signal detection mask, of shape (..., N).
+    m : int or numpy.array
+        Index of the first detected sample, of shape (...).
+    Kb : int
+        Symbol length in samples.
+
+    Returns
+    -------
+    k0 : int or numpy.array
+        Index of the end of the synchronization sequence, of shape (...).
+    """
+
+    # NOTE: "2" is hardcoded here, assumes two synchronization bits.
+    m = np.asarray(m)
+    k = np.minimum(m[..., None] + np.arange(2*Kb), xx.shape[-1]-1)
+    kp = np.maximum(k-Kb, 0)
+    q = (
+        np.real(np.take_along_axis(xx, k, axis=-1)*np.conj(np.take_along_axis(xx, kp, axis=-1)))
+        * np.take_along_axis(d, k, axis=-1)*np.take_along_axis(d, kp, axis=-1)*(k >= Kb)
+    )
+    k0 = m + np.argmin(q, axis=-1)
+
+    return k0
+
+def _loop_gains(Bn: float, zeta: float=1/np.sqrt(2)):
+    """
+    Proportional and integral gains of a second-order phase-locked loop with 
+    noise bandwidth `Bn` (normalized to the update rate) and damping `zeta`.
+    """
+    tn = Bn/(zeta + 1/(4*zeta))
+    Kp = 4*zeta*tn/(1 + 2*zeta*tn + tn**2)
+    Ki = 4*tn**2/(1 + 2*zeta*tn + tn**2)
+    return Kp, Ki
+
+def _track_phase(y, theta: float, omega: float, Kp: float, Ki: float):
+    """
+    One step of the decision-directed Costas loop for binary phase-shift 
+    keying.
+
+    Parameters
+    ----------
+    y : complex or numpy.array
+        Averaged symbol (of several signals).
+    theta : float or numpy.array
+        Phase of the symbol for the bit `1` at the previous symbol.
+    omega : float or numpy.array
+        Phase increment per symbol.
+    Kp, Ki : float
+        Loop gains, see _loop_gains().
+
+    Returns
+    -------
+    b : bool
+        The decided bit.
+    r : complex
+        The symbol rotated by the predicted phase, the bit is decided by the
+        sign of its real part.
+    theta : float
+        Updated phase of the symbol for the bit `1`.
+    omega : float
+        Updated phase increment per symbol.
+    """
+
+    # Predict the phase, rotate the symbol onto the real axis and decide
+    theta = theta + omega
+    r = y*np.exp(-1j*theta)
+    b = r.real > 0
+
+    # Phase error with respect to the decided symbol
+    e = np.angle(np.where(b, r, -r))
+    theta = theta + Kp*e
+    omega = omega + Ki*e
+
+    return b, r, theta, omega
+
+def _track_timing(y0, ym, y1, t: float, nu: float, A2: float, Kb: int, Kp: float, Ki: float):
+    """
+    One step of the timing-recovery loop using the Gardner timing-error 
+    detector.
+
+    Parameters
+    ----------
+    y0, ym, y1 : complex or numpy.array
+        Averaged signal at the previous sampling instant, halfway between the
+        previous and the current sampling instant, and at the current sampling
+        instant (of several signals).
+    t : float or numpy.array
+        Current sampling instant (fractional sample index).
+    nu : float or numpy.array
+        Deviation of the symbol length from `Kb` in samples.
+    A2 : float or numpy.array
+        Power of the (averaged) symbols.
+    Kb : int
+        Nominal symbol length in samples.
+    Kp, Ki : float
+        Loop gains, see _loop_gains().
+
+    Returns
+    -------
+    t : float
+        Corrected sampling instant.
+    nu : float
+        Updated deviation of the symbol length.
+    """
+
+    # Timing error in samples (positive if sampling too late). For a 
+    # transition between two symbols, the averaged signal is a ramp between
+    # them, which makes the error of ym proportional to the timing error.
+    eps = Kb/(4*A2)*np.real((y1 - y0)*np.conj(ym))
+    t = t - Kp*eps
+    nu = nu - Ki*eps
+
+    return t, nu
+
+def _frame_info(k0: int, nu: float, omega: float, r, keep, Kb: int, fs: float):
+    """
+    Collects the information about a decoded frame, see 
+    decode_baseband_signal().
+    """
+    info = {
+        'k0': k0,
+        'clock_offset': nu/Kb*1e6,
+        'carrier_offset': omega*fs/(2*np.pi*Kb)
+    }
+    info.update(_link_quality(r, keep))
+    return info
+
+def _link_quality(r, keep):
+    """
+    Estimates the quality of the link from the rotated symbols `r` (see 
+    _track_phase()) of shape (..., K) where `keep` is True.
+
+    The estimate is decision-directed: The amplitude A of the symbols is the
+    average projection onto the decided symbols, and the error vector of 
+    each symbol is its difference from the decided symbol +-A. Hence, the
+    noise includes both the in-phase and the quadrature component, and for 
+    binary phase-shift keying, the bit error rate is Q(sqrt(2*SNR)) (see 
+    rate.ber()).
+
+    Returns
+    -------
+    quality : dict
+        `'snr'` in dB, `'evm'`, and `'margin'` (arrays of shape (...)), see 
+        decode_baseband_signal(). All are NaN if there are no symbols.
+    """
+    n = np.sum(keep, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        A, Pe = _symbol_stats(r, keep)
+        margin = np.min(np.where(keep, np.abs(r.real), np.inf), axis=-1, initial=np.inf)/A
+        quality = {
+            'snr': 10*np.log10(A**2/Pe),
+            'evm': np.sqrt(Pe)/A,
+            'margin': np.where(n > 0, margin, np.nan)[()]
+        }
+    return quality
+
+def _symbol_stats(r, keep):
+    """
+    Decision-directed estimates of the amplitude `A` of the rotated symbols
+    `r` of shape (..., K) where `keep` is True, and of the power `Pe` of the
+    error vectors (see _link_quality()).
+    """
+    n = np.sum(keep, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        A = np.sum(np.abs(r.real)*keep, axis=-1)/n
+        e = r - np.sign(r.real)*A[..., None]
+        Pe = np.sum((e.real**2 + e.imag**2)*keep, axis=-1)/n
+    return A, Pe
+
+def _llr(r, keep):
+    """
+    Log-likelihood ratios log(P(1)/P(0)) of the bits given the rotated 
+    symbols `r` of shape (..., K) (where `keep` is True). The in-phase 
+    component of a symbol is +-A plus Gaussian noise with variance Pe/2 (half
+    of the error vector power, see _symbol_stats()), hence 
+
+        LLR = 4*A*Re(r)/Pe.
     """
-    Unwraps the phase for binary phase-shift keying modulated signals.
+    A, Pe = _symbol_stats(r, keep)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        llr = 4*A[..., None]*r.real/Pe[..., None]
+    return np.where(keep, llr, 0)
+
+def _moving_sum(x, K: int, out, h=None):
+    """
+    Sums of the last `K` samples of `x` of shape (..., N) along the last axis,
+    the same as signal.lfilter(np.ones((K,)), 1, x) but in O(N) instead of
+    O(N*K) operations and without temporaries: Each sum is the previous one
+    plus the new sample less the sample K samples back, which is a cumulative
+    sum of these differences. `h` are the K samples preceding `x` (zeros if
+    None), for filtering a stream in blocks. The sums are written to `out`,
+    which must not overlap with `x`, and returned.
+    """
+    N = x.shape[-1]
+    n = min(N, K)
+    np.copyto(out, x)
+    if h is not None:
+        out[..., :n] -= h[..., :n]
+    if N > K:
+        out[..., K:] -= x[..., :N-K]
+    np.cumsum(out, axis=-1, out=out)
+    if h is not None:
+        out += np.sum(h, axis=-1, keepdims=True)
+    return out
+
+def _interp(xx, t):
+    """
+    Linearly interpolates the signal `xx` of shape (..., N) at the fractional
+    indices `t` of shape (...).
+    """
+    t = np.asarray(t)
+    k = np.floor(t).astype(int)
+    a = t - k
+    x0 = np.take_along_axis(xx, k[..., None], axis=-1)[..., 0]
+    x1 = np.take_along_axis(xx, k[..., None]+1, axis=-1)[..., 0]
+    return (1-a)*x0 + a*x1
+
+def goertzel(x, f, fs: float, N: int):
+    """
+    Calculates the power of the signal `x` at the frequencies `f` in 
+    consecutive blocks of `N` samples using the Goertzel algorithm.
+
+    The Goertzel algorithm calculates a single bin of the discrete Fourier 
+    transform using the second-order recursion
+
+        s[n] = x[n] + 2*cos(w)*s[n-1] - s[n-2],
+
+    which only requires one real multiplication per sample and frequency. The 
+    blocks are weighted with a Hann window beforehand to reduce the leakage of
+    strong signals in other channels. The recursion is run for all blocks at 
+    once using a filter along the last axis.
 
     Parameters
     ----------
-    xp : numpy.array
-        Phase signal.
-    alpha : float, default: pi/8
-        Closeness threshold.
+    x : numpy.array
+        Signal. Trailing samples that do not fill a whole block are ignored.
+    f : numpy.array
+        Frequencies in Hz.
+    fs : float
+        Sampling frequency in Hz.
+    N : int
+        Block length in samples.
 
     Returns
     -------
-    xp : numpy.array
-        Unwrapped signal.
+    P : numpy.array
+        Power of the blocks (rows) at the frequencies (columns), normalized 
+        such that a sinusoid with amplitude A at frequency f has power A^2/2.
     """
 
-    # Wrap +pi to -pi
-    dpi = np.pi-xp
-    iclose = (dpi < alpha) & (dpi > 0)
-    xp[iclose] = xp[iclose]-2*np.pi
+    f = np.atleast_1d(f)
+    Nb = x.shape[0]//N
+    w = signal.windows.hann(N, sym=False)
+    xw = x[:Nb*N].reshape((Nb, N))*w
 
-    # Rotate by alpha to remove sign switches around 0 (but preserve curve)
-    xp = xp + alpha
+    P = np.zeros((Nb, f.shape[0]))
+    for i in range(f.shape[0]):
+        c = 2*np.cos(2*np.pi*f[i]/fs)
+        s = signal.lfilter([1], [1, -c, 1], xw, axis=-1)
+        P[:, i] = s[:, -1]**2 + s[:, -2]**2 - c*s[:, -1]*s[:, -2]
+    P = P*2/np.sum(w)**2
+
+    return P
+
+def energy_gate(blocks, fs: float, channel_ids, Tblock: float=0.04, Tavg: float=0.2, threshold: float=7.0, Tcal: float=2.0, Tpre: float=0.5, Thold: float=0.5):
+    """
+    Monitors an audio stream for transmissions on one or several channels and
+    only forwards the parts of the stream where a channel is active. This is
+    meant to be used as a cheap front-end that wakes the (expensive) 
+    demodulation and decoding chain only when there is something to decode.
 
-    return xp
+    The stream is processed in blocks of `Tblock` seconds, and the power at 
+    the carrier frequency of each channel is calculated using goertzel() and
+    averaged over the last `Tavg` seconds. A channel becomes active when its
+    averaged power is more than `threshold` dB above its noise floor. Since 
+    the power of noise in a block is exponentially distributed, averaging over
+    M blocks makes it Gamma-distributed with shape M. For the defaults (M = 5,
+    7 dB), the probability of a false trigger is about 3e-7 per block and 
+    channel. The noise floor of each channel is the average power of the 
+    blocks where the channel is idle over (roughly) the last `Tcal` seconds.
+
+    The first `Tcal` seconds of the stream are used to calibrate the noise
+    floor, which must be robust to a transmission within them. The floor is
+    calibrated by minimum statistics (see _noise_floor()), which only 
+    requires one window of `Tavg` seconds within the calibration to be idle.
+    Blocks above 10 times the floor never update it. The stream is kept 
+    during the calibration, such that a transmission that started within it
+    is forwarded from the start of the stream.
+
+    The last `Tpre` seconds of the stream are kept in a ring buffer such that
+    the forwarded signal starts before the trigger, which gives the filters 
+    of the receiver time to settle and the decoder some signal-free samples.
+    A channel remains active until its power has been below the threshold for
+    `Thold` seconds.
+
+    Parameters
+    ----------
+    blocks : iterable
+        An iterable of consecutive blocks of the audio signal of arbitrary 
+        (also varying) lengths.
+    fs : float
+        Sampling frequency in Hz.
+    channel_ids : list of int
+        The ids of the channels to monitor.
+    Tblock : float, default: 0.04
+        Block length in seconds. Determines the bandwidth of the detector, 
+        which should not be much wider than the channel (roughly 2/Tblock).
+    Tavg : float, default: 0.2
+        Averaging time of the block powers in seconds.
+    threshold : float, default: 7.0
+        Detection threshold in dB above the noise floor.
+    Tcal : float, default: 2.0
+        Calibration time and time constant of the noise floor estimate in
+        seconds.
+    Tpre : float, default: 0.5
+        Pre-trigger duration in seconds.
+    Thold : float, default: 0.5
+        Hold time in seconds.
+
+    Yields
+    ------
+    channel_id : int
+        Id of the active channel.
+    k : int
+        Index of the first sample of `x`.
+    x : numpy.array or None
+        The next samples of the active channel. The first block after a 
+        trigger includes the pre-trigger samples. `None` marks the end of 
+        the activity.
+    """
+
+    channel_ids = list(channel_ids)
+    for channel_id in channel_ids:
+        _check_channel(channel_id)
+    fcs = (_channels[0, channel_ids] + _channels[1, channel_ids])/2
+
+    N = int(np.round(Tblock*fs))
+    M = max(int(np.round(Tavg/Tblock)), 1)
+    Ncal = max(int(np.round(Tcal/Tblock)), 1)
+    Nhold = int(np.round(Thold/Tblock))
+    gamma = 10**(threshold/10)
+
+    # Noise floor and the number of blocks it has been averaged over (both
+    # set at the end of the calibration), the block powers during the 
+    # calibration, the number of calibration blocks so far, and the number 
+    # of blocks since the channel's power was last above the threshold (None
+    # if idle)
+    Pn = np.zeros(fcs.shape)
+    Nn = np.zeros(fcs.shape, dtype=int)
+    Pcal = np.zeros((Ncal, fcs.shape[0]))
+    Nc = 0
+    hold = [None]*len(channel_ids)
+
+    # Powers of the last M-1 blocks for the moving average
+    Ph = np.zeros((M-1, fcs.shape[0]))
+
+    # The input samples that do not fill a block yet and the pre-trigger 
+    # samples (all samples during the calibration) are kept in ring buffers.
+    # The forwarded blocks are copies, since the buffers are reused.
+    Npre = max(int(np.round(Tpre/Tblock)), 1)*N
+    pre = RingBuffer(2*(Npre + Ncal*N))
+    x = RingBuffer(2*N)
+    n = 0
+    for xin in blocks:
+        x.append(np.asarray(xin, dtype=float))
+        Nb = len(x)//N
+        if Nb == 0:
+            continue
+        P = goertzel(x.data, fcs, fs, N)
+        Pc = np.cumsum(np.vstack((np.zeros((1, fcs.shape[0])), Ph, P)), axis=0)
+        Pavg = (Pc[M:] - Pc[:-M])/M
+        Ph = np.vstack((Ph, P))[Nb:]
+
+        for j in range(Nb):
+            xj = x.data[j*N:(j+1)*N]
+            kj = n + j*N
+            if Nc < Ncal:
+                Pcal[Nc] = P[j]
+                Nc += 1
+                if Nc < Ncal:
+                    pre.append(xj)
+                    continue
+                Pn, Nn = _noise_floor(Pcal, M, gamma)
+
+            for i, channel_id in enumerate(channel_ids):
+                active = Pavg[j, i] > gamma*Pn[i]
+
+                if active and hold[i] is None:
+                    # Trigger: Forward the pre-trigger buffer as well
+                    hold[i] = 0
+                    yield (channel_id, kj-len(pre), np.concatenate((pre.data, xj)))
+                elif hold[i] is not None:
+                    hold[i] = 0 if active else hold[i]+1
+                    yield (channel_id, kj, xj.copy())
+                    if hold[i] >= Nhold:
+                        hold[i] = None
+                        yield (channel_id, kj+N, None)
+                elif P[j, i] < 10*Pn[i]:
+                    # Idle: Update the noise floor
+                    Nn[i] += 1
+                    Pn[i] += (P[j, i] - Pn[i])/min(Nn[i], Ncal)
+            pre.append(xj)
+            pre.discard(len(pre) - Npre)
+
+        x.discard(Nb*N)
+        n += Nb*N
+
+def _noise_floor(P, M: int, gamma: float):
+    """
+    Estimates the mean noise power from the block powers `P` of the 
+    calibration (one column per channel), which may include a transmission,
+    by minimum statistics: The blocks are averaged in windows of `M` blocks,
+    and the smallest window average is only set by the noise as long as one
+    window is idle. The windows below `gamma` times the smallest one are 
+    considered idle (as in energy_gate()). The minimum of the averages of K
+    idle windows is biased low, hence it is divided by its expected value 
+    for noise (the window average of exponentially distributed powers is 
+    Gamma-distributed with shape M).
+
+    Returns the floor and the number of (idle) blocks it is based on.
+    """
+    K = P.shape[0]//M
+    if K == 0:
+        return np.mean(P, axis=0), np.full(P.shape[1:], P.shape[0])
+    Pw = np.mean(P[:K*M].reshape((K, M, -1)), axis=1)
+    Pmin = np.min(Pw, axis=0)
+    Ks = np.sum(Pw < gamma*Pmin, axis=0)
+    bias = np.array([integrate.quad(lambda x: stats.gamma.sf(x, M, scale=1/M)**k, 0, np.inf)[0] for k in Ks])
+    return Pmin/bias, Ks*M
 
 def simulate_channel(x, fs: float, channel_id: int, SNR: float=20.0, eta: float=0.25, dmax: float=5.0):
     """
@@ -256,10 +1378,16 @@ def simulate_channel(x, fs: float, channel_id: int, SNR: float=20.0, eta: float=
     /!\ The default values for `SNR`, `eta`,  as well as `dmax` should not be
         changed unless you know what you are doing. /!\
 
+    Several signals can be transmitted at once by stacking them along the 
+    leading dimensions of `x`. Each signal is then transmitted over an
+    independent realization of the channel (distance, noise, and 
+    interference).
+
     Parameters
     ----------
     x : numpy.array
-        The modulated signal to be transmitted.
+        The modulated signal to be transmitted, or an array of shape (..., N)
+        of several signals.
 
     fs : float
         Sampling frequency.
@@ -281,35 +1409,40 @@ def simulate_channel(x, fs: float, channel_id: int, SNR: float=20.0, eta: float=
     Returns
     -------
     y : numpy.array
-        The signal received by the receiver.
+        The signal received by the receiver, or an array of shape (..., Ny) of
+        the received signals (zero-padded to the same length before adding the
+        noise and interference).
     """
 
     # Get channel parameters
-    if not (channel_id >= 1 and channel_id < _channels.shape[1]-1):
-        raise ValueError(f'channel_id must be between 1 and {_channels.shape[1]}, but {channel_id} given.')
+    _check_channel(channel_id)
     channel = _channels[:, channel_id]
 
-    # Create the channel impulse response: A Kronecker delta with amplitude 
+    # Work on a (B, N) array of signals
+    x = np.asarray(x)
+    shape = x.shape[:-1]
+    x = x.reshape((-1, x.shape[-1]))
+    B, N = x.shape
+    rows = np.arange(B)
+
+    # The channel impulse response is a Kronecker delta with amplitude 
     # exp(-eta*d) at sample m
     c = 340
-    d = dmax*np.random.rand(1)
-    m = int(np.round(d/c*fs))
-    h = np.zeros(m+1)
-    h[m] = np.exp(-eta*d)
+    d = dmax*np.random.rand(B)
+    m = np.round(d/c*fs).astype(int)
 
     # Zero-pad x to make sure the whole signal is preserved. Also adds a buffer
     # of 0.5 s to the signal to ensure that filtering operations on the 
     # receiver side don't cut the (baseband) signal.
     Nbuf = int(np.round(0.5*fs))
-    x = np.concatenate((x, np.zeros(m+Nbuf,)))
+    Nx = N + np.max(m) + Nbuf
 
     # Calculate the noise variance based on the SNR (and the sampling 
     # frequency)
     fb = (channel[1] - channel[0])/2            # One-sided channel bandwidth
     Pnoise = 10**((channel[2] - SNR)/10)*1e-3   # In-band noise power for given SNR
     sigma2 = Pnoise*fs/(4*fb)                   # White noise power for given SNR
-    Nx = x.shape[0]
-    vn = np.sqrt(sigma2)*np.random.randn(Nx)
+    vn = np.sqrt(sigma2)*np.random.randn(B, Nx)
 
     # Add out-of-band interference at a random channel, uniformly distributed
     # outside the channel's frequency band taking aliasing into account (i.e.,
@@ -320,17 +1453,19 @@ def simulate_channel(x, fs: float, channel_id: int, SNR: float=20.0, eta: float=
     fcs = (_channels[0, :]+_channels[1, :])/2
     ichannels = (fcs <= 2*fc) & (fcs != fc)
     fcs = fcs[ichannels]
-    ichannel = np.random.randint(0, fcs.shape[0])
+    ichannel = np.random.randint(0, fcs.shape[0], size=B)
     fi = fcs[ichannel]
 
     # Now, sample the interference amplitude with a mean of 1 (30 dBm) and 
     # a standard deviation of 0.2 (95 % between 0.6 and 1.4). Then add 
     # everything together to generate the interference signal
-    Ai = 1 + 0.2*np.random.rand(1)
-    k = np.arange(0, x.shape[0])
-    vi = Ai*np.sin(2*np.pi*fi*k/fs)
+    Ai = 1 + 0.2*np.random.rand(B)
+    k = np.arange(0, Nx)
+    vi = Ai[:, None]*np.sin(2*np.pi*fi[:, None]*k/fs)
 
-    # Construct received signal
-    y = signal.lfilter(h, 1, x) + vn + vi
+    # Construct received signal: Delay and attenuate the signal, then add 
+    # noise and interference
+    y = vn + vi
+    y[rows[:, None], m[:, None] + np.arange(N)] += np.exp(-eta*d)[:, None]*x
 
-    return y
+    return y.reshape(shape + (Nx,))
@@ -10,41 +10,22 @@ T_b_1 = 4 / bandwidth  # 0.08
 T_b_2 = 6 / bandwidth  # 0.12
 N = 1  # Number of rect pulses
 
-# Time vector for x_b(t)
-t1 = np.linspace(-3 * T_b_1, 3 * T_b_1, 1000)
-t2 = np.linspace(-3 * T_b_2, 3 * T_b_2, 1000)
-
 # Frequency vector for plot
 freqs = np.linspace(3400, 3600, 1000) * 2 * np.pi
 
 
-def X_b_w(T_b, N, w, t):  # nothing done for b_n
-    X_b_w = np.zeros_like(t, dtype=complex)
+def X_b_w(T_b, N, w):  # nothing done for b_n
+    # Evaluated for all frequencies in w at once
+    X_b_w = np.zeros_like(w, dtype=complex)
     for n in range(N):
         delay = (2 * n + 1) * T_b / 2
         X_b_w += np.sinc(w * T_b / (2 * np.pi)) * np.exp(-1j * w * delay)
     return X_b_w
 
 
-X_m_w_1 = np.array(
-    [
-        A_carrier
-        * 1j
-        / 2
-        * (X_b_w(T_b_1, N, w + w_carrier, t1) - X_b_w(T_b_1, N, w - w_carrier, t1))
-        for w in freqs
-    ]
-)
+X_m_w_1 = A_carrier * 1j / 2 * (X_b_w(T_b_1, N, freqs + w_carrier) - X_b_w(T_b_1, N, freqs - w_carrier))
 
-X_m_w_2 = np.array(
-    [
-        A_carrier
-        * 1j
-        / 2
-        * (X_b_w(T_b_2, N, w + w_carrier, t2) - X_b_w(T_b_2, N, w - w_carrier, t2))
-        for w in freqs
-    ]
-)
+X_m_w_2 = A_carrier * 1j / 2 * (X_b_w(T_b_2, N, freqs + w_carrier) - X_b_w(T_b_2, N, freqs - w_carrier))
 
 plt.figure(figsize=(10, 5))
 plt.subplot(1, 2, 1)
@@ -1,25 +1,19 @@
+# Run from the repository root as python -m plotters.elliptic
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import ellip, ellipord, freqz
+from lib.spectrum import filter_response
 
-# Specifications
-fs = 35000  # Sampling frequency (arbitrary, ensure it's much higher than max frequency)
-fpass = [3475, 3525]  # Passband frequencies (Hz)
-fstop = [3450, 3550]  # Stopband frequencies (Hz)
-gpass = 0.1  # Passband ripple (dB)
-gstop = 40  # Stopband attenuation (dB)
+# Specifications of the band-limiting filter of the transmitter
+fs = 35000  # Sampling frequency
+channel_id = 12
+fpass = [3475, 3525]  # Passband frequencies (Hz), channel 12
+f_transition = 25  # Transition band width (Hz)
+fstop = [fpass[0] - f_transition, fpass[1] + f_transition]  # Stopband frequencies (Hz)
+gpass = 1  # Passband ripple (dB)
+gstop = 60  # Stopband attenuation (dB)
 
-# Normalize frequencies
-wp = np.array(fpass) / (fs / 2)
-ws = np.array(fstop) / (fs / 2)
-
-# Design filter
-n, wn = ellipord(wp, ws, gpass, gstop)
-b, a = ellip(n, gpass, gstop, wn, btype='band')
-
-# Frequency response
-w, h = freqz(b, a, worN=8000)
-frequencies = w * fs / (2 * np.pi)
+# Frequency response, designed as in the transmitter
+frequencies, h = filter_response(channel_id, 0, fs/2, 8000, fs, f_transition, gpass, gstop)
 
 # Plot
 plt.figure(figsize=(8, 4))
@@ -1,42 +1,30 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from scipy import signal
 import lib.wcslib as wcs
+from lib.modem import filter_bp, demodulator
+from lib.dataflow import run_graph
 import sounddevice as sd
 import matplotlib.pyplot as plt
 
-def filter_bp(f_pass, f_stop, A_pass, A_stop, f_sample):
-    fn = f_sample / 2
+# Collects the parts of the recording where the channels are active, as
+# detected by the energy gate, as (channel_id, start index, signal)
+def active_segments(y, f_sample, channel_ids):
+    segments = []
+    chunks = {}
+    for channel_id, k, x in wcs.energy_gate([y], f_sample, channel_ids):
+        if x is not None:
+            chunks.setdefault(channel_id, []).append((k, x))
+        else:
+            k0 = chunks[channel_id][0][0]
+            segments.append((channel_id, k0, np.concatenate([x for k, x in chunks.pop(channel_id)])))
 
-    w_pass = [f / fn for f in f_pass]
-    w_stop = [f / fn for f in f_stop]
+    # Channels still active at the end of the recording
+    for channel_id, c in chunks.items():
+        segments.append((channel_id, c[0][0], np.concatenate([x for k, x in c])))
 
-    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
-
-def filter_lp(f_pass, f_stop, A_pass, A_stop, f_sample):
-    fn = f_sample / 2
-
-    w_pass = f_pass / fn
-    w_stop = f_stop / fn
-
-    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
-
-
-def demodulator(f_carrier, y, f_stop, A_pass, A_stop, f_sample):
-    y = y[:, 0]
-
-    t = np.arange(len(y)) / f_sample
-
-    # Mix the received signal with in-phase and quadrature carriers
-    y_i_d = y * np.cos(2 * np.pi * f_carrier * t)
-    y_q_d = -y * np.sin(2 * np.pi * f_carrier * t)
-
-    lp_filter_b, lp_filter_a = filter_lp(f_carrier, f_stop, A_pass, A_stop, f_sample)
-
-    y_i_d_filtered = signal.lfilter(lp_filter_b, lp_filter_a, x=y_i_d)
-    y_q_d_filtered = signal.lfilter(lp_filter_b, lp_filter_a, x=y_q_d)
-
-    return y_i_d_filtered + 1j * y_q_d_filtered
+    return segments
 
 def main():
     rec_time = 60
@@ -64,35 +52,49 @@ def main():
     sd.wait()
     print("Recording done")
 
-    yb = signal.lfilter(ellip_filter_b, ellip_filter_a, x=y)
-    print("bandlimiting done")
-
-    yb_demodulated = demodulator(f_carrier, yb, f_pass[1], A_pass, A_stop, fs)
-    ybm = np.abs(yb_demodulated)
-    ybp = np.angle(yb_demodulated)
-    print("demodulation done")
-
-    br = wcs.decode_baseband_signal(ybm, ybp, Tb, fs)
+    # Only run the receiver chain where there is a transmission
+    segments = active_segments(y[:, 0], fs, [channel_id])
+    print("gating done: " + str(len(segments)) + " transmission(s)")
+
+    # The receiver chain of each segment as a graph of stages, the chains of
+    # independent segments run concurrently. The averaging filters within the
+    # decoder run in parallel chunks on a separate pool (waiting for them on
+    # the pool of the stages could deadlock).
+    with ThreadPoolExecutor() as pool:
+        stages = {}
+        for i, (_, k, ys) in enumerate(segments):
+            stages[f"yb{i}"] = (lambda ys: signal.lfilter(ellip_filter_b, ellip_filter_a, x=ys), [f"ys{i}"])
+            stages[f"yd{i}"] = (lambda yb: demodulator(f_carrier, yb, f_pass[1], A_pass, A_stop, fs), [f"yb{i}"])
+            stages[f"br{i}"] = (lambda yd: wcs.decode_baseband_signal(yd, Tb, fs, executor=pool), [f"yd{i}"])
+        results = run_graph(stages, {f"ys{i}": ys for i, (_, k, ys) in enumerate(segments)})
+    print("bandlimiting, demodulation, and decoding done")
+
+    for i, (_, k, ys) in enumerate(segments):
+        yb_demodulated = results[f"yd{i}"]
+        br = results[f"br{i}"]
+
+        print("Expected bits:" + str(len(expected_bits)))
+        #counter = 0
+        #for i in range(len(br)):
+        #    if not (expected_bits[i] == 1 and br[i] == True or expected_bits[i] == 0 and br[i] == False):
+        #        counter+=1
+
+        t = (k + np.arange(len(ys))) / fs
+        print("Number of recieved bits:" + str(len(br)))
+        #print("Incorrect bits: " + str(counter))
+        data_rx = wcs.decode_string(br)
+        print("Received: " + data_rx)
+
+        ybm = np.abs(yb_demodulated)
+        ybp = np.angle(yb_demodulated)
+        plt.subplot(1, 2, 1)
+        plt.plot(t, ybp)
+        plt.grid()
+
+        plt.subplot(1, 2, 2)
+        plt.plot(t, ybm)
+        plt.grid()
 
-    print("Expected bits:" + str(len(expected_bits)))
-    #counter = 0
-    #for i in range(len(br)):
-    #    if not (expected_bits[i] == 1 and br[i] == True or expected_bits[i] == 0 and br[i] == False):
-    #        counter+=1
-    
-    t = np.arange(0, rec_time, 1/fs)
-    print("Number of recieved bits:" + str(len(br)))
-    #print("Incorrect bits: " + str(counter))
-    data_rx = wcs.decode_string(br)
-    print("Received: " + data_rx)
-    plt.subplot(1, 2, 1)
-    plt.plot(t, ybp)
-    plt.grid()
-    
-    plt.subplot(1, 2, 2)
-    plt.plot(t, ybm)
-    plt.grid()
-    
     plt.show()
 
 if __name__ == "__main__":
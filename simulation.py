@@ -10,6 +10,9 @@ $ python3 simulation.py "Hello World!"
 For binary inputs, run:
 $ python3 simulation.py -b 010010000110100100100001
 
+For compressed plain text inputs (see wcs.encode_message()), run:
+$ python3 simulation.py -c "Hello World!"
+
 2020-present -- Roland Hostettler <roland.hostettler@angstrom.uu.se>
 """
 
@@ -22,59 +25,13 @@ William Mårback
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from scipy import signal
 
 # import matplotlib.pyplot as plt
 import lib.wcslib as wcs
-
-
-# f_pass and f_stop are input as tuples in Hz
-# A_pass and A_stop are input in DB
-def filter_bp(f_pass, f_stop, A_pass, A_stop, f_sample):
-    fn = f_sample / 2
-
-    w_pass = [f / fn for f in f_pass]
-    w_stop = [f / fn for f in f_stop]
-
-    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
-
-
-def filter_lp(f_pass, f_stop, A_pass, A_stop, f_sample):
-    fn = f_sample / 2
-
-    w_pass = f_pass / fn
-    w_stop = f_stop / fn
-
-    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
-
-
-# f_carrier in Hz
-# x_bt input signal
-def modulator(A_carrier, f_carrier, x_bt, f_sampling):
-    # Time vector based on the sampling frequency and signal length
-    t = np.arange(len(x_bt)) / f_sampling
-
-    # Generate the modulated signal using vectorized operations
-    x_mt = A_carrier * np.sin(2 * np.pi * f_carrier * t) * x_bt
-
-    return x_mt
-
-
-def demodulator(f_carrier, y, f_stop, A_pass, A_stop, f_sample):
-
-    t = np.arange(len(y)) / f_sample
-
-    # Mix the received signal with in-phase and quadrature carriers
-    y_i_d = y * np.cos(2 * np.pi * f_carrier * t)
-    y_q_d = -y * np.sin(2 * np.pi * f_carrier * t)
-
-    lp_filter_b, lp_filter_a = filter_lp(f_carrier, f_stop, A_pass, A_stop, f_sample)
-
-    y_i_d_filtered = signal.lfilter(lp_filter_b, lp_filter_a, x=y_i_d)
-    y_q_d_filtered = signal.lfilter(lp_filter_b, lp_filter_a, x=y_q_d)
-
-    return y_i_d_filtered + 1j * y_q_d_filtered
+from lib.modem import filter_bp, modulator, demodulator
 
 
 def main():
@@ -96,6 +53,7 @@ def main():
 
     # Detect input or set defaults
     string_data = True
+    compress = False
     data = None
     if len(sys.argv) == 2:
         data = str(sys.argv[1])
@@ -104,6 +62,10 @@ def main():
         string_data = False
         data = str(sys.argv[2])
 
+    elif len(sys.argv) == 3 and str(sys.argv[1]) == "-c":
+        compress = True
+        data = str(sys.argv[2])
+
     else:
         print("Warning: No input arguments, using defaults.", file=sys.stderr)
         # data = "a"
@@ -111,9 +73,12 @@ def main():
         # data = "aaa"
         data = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed tempor condimentum enim. Curabitur eget ex ut ante egestas maximus pulvinar sit amet urna. Etiam varius ullamcorper felis ac iaculis. Nulla vitae nisl efficitur, pharetra augue fringilla, tristique nunc. Fusce mollis id massa ac congue. Sed nec porta mauris. Sed consequat."
 
-    # Convert string to bit sequence or string bit sequence to numeric bit
-    # sequence
-    if string_data:
+    # Convert string to (compressed) bit sequence or string bit sequence to
+    # numeric bit sequence
+    if compress:
+        bs, report = wcs.encode_message(data, Tb=Tb, full_output=True)
+        print(f"Compression: {report['method']}, {report['raw_bits']} -> {report['coded_bits']} bits (ratio {report['ratio']:.2f}), air-time {report['airtime']:.1f} s ({report['airtime_saved']:.1f} s saved)")
+    elif string_data:
         bs = wcs.encode_string(data)
     else:
         bs = np.array([bit for bit in map(int, data)])
@@ -141,12 +106,19 @@ def main():
 
     yb = signal.lfilter(ellip_filter_b, ellip_filter_a, x=yr)
     yb_demodulated = demodulator(f_carrier, yb, f_pass[1], A_pass, A_stop, fs)
-    ybm = np.abs(yb_demodulated)
-    ybp = np.angle(yb_demodulated)
 
-    # Baseband and string decoding
-    br = wcs.decode_baseband_signal(ybm, ybp, Tb, fs)
-    data_rx = wcs.decode_string(br)
+    # Baseband and string decoding, the averaging filters of the decoder run
+    # concurrently on a thread pool
+    with ThreadPoolExecutor() as pool:
+        br = wcs.decode_baseband_signal(yb_demodulated, Tb, fs, executor=pool)
+    if compress:
+        # A compressed message with bit errors cannot always be decompressed
+        try:
+            data_rx = wcs.decode_message(br)
+        except ValueError as e:
+            data_rx = "<" + str(e) + ">"
+    else:
+        data_rx = wcs.decode_string(br)
     print("Received: " + data_rx)
 
 
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from scipy import signal
+import lib.wcslib as wcs
+from lib.modem import filter_bp, modulator
+
+
+fs = 35e3
+Tb = 0.12
+
+
+def segments(y):
+    # Runs the gate over blocks of the recording and returns the active
+    # segments of channel 12 as (start, end) in samples
+    out = []
+    active = False
+    for channel_id, k, x in wcs.energy_gate([y[i:i+4000] for i in range(0, y.shape[0], 4000)], fs, [12]):
+        if x is None:
+            active = False
+        elif active:
+            out[-1][1] = k + x.shape[0]
+        else:
+            out.append([k, k + x.shape[0]])
+            active = True
+    return out
+
+
+# Transmissions that start within the calibration of the gate (Tcal = 2 s),
+# the floor must still be set by the idle part of the calibration
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("lead", [0.3, 1.0])
+def test_gate_detects_transmission_within_calibration(lead, seed):
+    b, a = filter_bp((3475, 3525), (3450, 3550), 1, 60, fs)
+    xt = signal.lfilter(b, a, modulator(1, 3500, wcs.encode_baseband_signal(wcs.encode_string("Hello"), Tb, fs), fs))
+    x = np.zeros((int(15*fs),))
+    k = int(lead*fs)
+    x[k:k+xt.shape[0]] = xt
+    np.random.seed(seed)
+
+    s = segments(wcs.simulate_channel(x, fs, 12))
+
+    assert len(s) == 1
+    assert s[0][0] <= k and s[0][1] >= k + xt.shape[0]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_gate_idle_on_noise(seed):
+    np.random.seed(seed)
+    assert segments(wcs.simulate_channel(np.zeros((int(15*fs),)), fs, 12)) == []
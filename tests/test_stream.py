@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from scipy import signal
+import lib.wcslib as wcs
+from lib.modem import filter_bp, demodulator, modulator
+
+
+fs = 35e3
+Tb = 0.12
+f_pass = (3475, 3525)
+f_stop = (3450, 3550)
+
+
+def receive(message, seed):
+    # Transmits the message after a second of silence (for the calibration
+    # of the stream decoder) over the simulated channel 12 and demodulates it
+    b, a = filter_bp(f_pass, f_stop, 1, 60, fs)
+    bits = wcs.encode_string(message)
+    xb = wcs.encode_baseband_signal(bits, Tb, fs)
+    xt = signal.lfilter(b, a, modulator(1, 3500, xb, fs))
+    xt = np.concatenate((np.zeros((int(fs),)), xt))
+    np.random.seed(seed)
+    yr = wcs.simulate_channel(xt, fs, 12)
+    return bits, demodulator(3500, signal.lfilter(b, a, yr), f_pass[1], 1, 60, fs)
+
+
+# Seeds that place the receiver at 4.4 and 4.5 m, close to the maximum
+# distance of the channel
+@pytest.mark.parametrize("seed", [6, 8])
+def test_stream_matches_batch_at_far_distance(seed):
+    bits, yd = receive("The quick brown fox jumps over it", seed)
+
+    br = wcs.decode_baseband_signal(yd, Tb, fs)
+    events = list(wcs.decode_baseband_stream([yd[i:i+4096] for i in range(0, yd.shape[0], 4096)], Tb, fs))
+    bs = np.array([value for kind, k, value, latency in events if kind == 'bit'])
+
+    assert [kind for kind, k, value, latency in events if kind != 'bit'] == ['detect', 'sync', 'end']
+    assert np.array_equal(br[:bits.shape[0]], bits)
+    assert np.array_equal(bs, br)
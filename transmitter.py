@@ -1,53 +1,32 @@
 import sys
 import numpy as np
-from scipy import signal
 import lib.wcslib as wcs
+from lib.modem import filter_bp
+from lib.synth import Synthesizer
 import sounddevice as sd
 
-def filter_bp(f_pass, f_stop, A_pass, A_stop, f_sample):
-    fn = f_sample / 2
+def transmitter(data, Tb, fs, A_carrier, f_carrier, f_pass, f_stop, A_pass, A_stop, synth=None):
+    # The synthesizer caches the symbol responses and the rendered messages,
+    # pass the same instance to reuse them between transmissions
+    if synth is None:
+        ellip_filter_b, ellip_filter_a = filter_bp(f_pass, f_stop, A_pass, A_stop, fs)
+        synth = Synthesizer(Tb, fs, A_carrier, f_carrier, ellip_filter_b, ellip_filter_a)
 
-    w_pass = [f / fn for f in f_pass]
-    w_stop = [f / fn for f in f_stop]
-
-    return signal.iirdesign(w_pass, w_stop, A_pass, A_stop, ftype="ellip")
-
-# f_carrier in Hz
-# x_bt input signal
-def modulator(A_carrier, f_carrier, x_bt, f_sampling):
-    # Time vector based on the sampling frequency and signal length
-    t = np.arange(len(x_bt)) / f_sampling
-
-    # Generate the modulated signal using vectorized operations
-    x_mt = A_carrier * np.sin(2 * np.pi * f_carrier * t) * x_bt
-
-    return x_mt
-
-def transmitter(data, Tb, fs, A_carrier, f_carrier, f_pass, f_stop, A_pass, A_stop):    
-    # Encode baseband signal
+    # Encode string
     bs = wcs.encode_string(data)
-    xb = wcs.encode_baseband_signal(bs, Tb, fs)
 
     print("encoding done")
 
-    # modulate
-    xb_modulated = modulator(A_carrier, f_carrier, xb, fs)
-    
-    # from wcslib
+    # Encode, modulate, and bandlimit by overlap-adding the filtered symbol
+    # responses, followed by the random delay and buffer (from wcslib)
     dmax = 5.0
     c = 340
     d = dmax*np.random.rand(1)
     m = int(np.round(d/c*fs))
     Nbuf = int(np.round(0.5*fs))
-    xb_modulated = np.concatenate((xb_modulated, np.zeros(m+Nbuf)))
-
-    print("modulation done")
-
-    # bandlimit
-    ellip_filter_b, ellip_filter_a = filter_bp(f_pass, f_stop, A_pass, A_stop, fs)
-    xt = signal.lfilter(ellip_filter_b, ellip_filter_a, x=xb_modulated)
+    xt = synth.render(bs, (len(bs)+2)*synth.Kb + m + Nbuf)
 
-    print("bandlimiting done")
+    print("modulation and bandlimiting done")
 
     # send
     sd.play(xt, fs , blocking=True)